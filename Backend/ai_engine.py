@@ -1,14 +1,34 @@
 import os
 import json
 import re
-from groq import Groq
+import threading
 from dotenv import load_dotenv
+from log_config import get_logger
+from datetime import date, datetime, timedelta
+from metrics import observe_upstream, record_llm_usage, TASK_EXTRACTIONS
+from tracing import span
 
 load_dotenv()
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+logger = get_logger("ai")
+
 MODEL = "llama-3.3-70b-versatile"
 
+# Groq client, created on first use (or by the warm-up task) — see get_client()
+client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the shared Groq client, importing groq and creating it on first use."""
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from groq import Groq
+                client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    return client
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # KEYWORD-BASED EMAIL FILTERING
 # Only emails matching these keywords will be processed into tasks.
@@ -81,6 +101,12 @@ ALL_KEYWORDS = (
     FINANCIAL_KEYWORDS + DOCUMENT_KEYWORDS + URGENCY_KEYWORDS + PHRASE_KEYWORDS
 )
 
+# Keywords pushed down to Gmail search (see gmail_service.build_search_queries).
+# Words found in almost every email would make the search match everything,
+# so those are left to the local filter.
+_UNSEARCHABLE_KEYWORDS = {"by", "before", "within", "prior to", "must", "required", "update", "send", "share", "return"}
+SEARCH_KEYWORDS = [kw for kw in ALL_KEYWORDS if kw not in _UNSEARCHABLE_KEYWORDS]
+
 # Words to IGNORE — emails containing ONLY these are skipped
 IGNORE_KEYWORDS = [
     "newsletter", "discount", "offer", "sale", "promotion", "advertisement",
@@ -88,6 +114,9 @@ IGNORE_KEYWORDS = [
     "thanks", "congratulations",
 ]
 
+# Characters of email body text sent to the model per extraction call (~4 chars per token)
+EMAIL_CONTENT_BUDGET = int(os.getenv("EMAIL_CONTENT_BUDGET", "6000"))
+
 # Date Pattern Regex (DD-MM-YYYY, YYYY-MM-DD, HH:MM, etc.)
 DATE_PATTERN = re.compile(r'\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}[-/]\d{1,2}[-/]\d{1,2}|\d{1,2}:\d{2}\s?(?:am|pm)?', re.IGNORECASE)
 
@@ -144,63 +173,292 @@ def filter_emails_by_keywords(emails: list[dict]) -> list[dict]:
     return filtered
 
 
-def extract_tasks_from_emails(
-    emails: list[dict],
-    existing_titles: list[str] = None,
-    calendar_events: list[dict] = None,
-) -> list[dict]:
+# ═══════════════════════════════════════════════════════════════════════════════
+# RULE-BASED FAST PATH
+# Formulaic emails ("Invoice due 12/03/2026", "Interview on 14 March at 10:30 am")
+# become tasks without a model call; anything ambiguous still goes to Groq.
+# ═══════════════════════════════════════════════════════════════════════════════
+
+FAST_EXTRACT = os.getenv("FAST_EXTRACT", "1") != "0"
+
+_MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3, "apr": 4, "april": 4,
+    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7, "aug": 8, "august": 8, "sep": 9, "sept": 9,
+    "september": 9, "oct": 10, "october": 10, "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+_MONTH = "(" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + r")\.?"
+MONTH_DATE_PATTERN = re.compile(
+    rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?{_MONTH},?(?:\s+(\d{{4}}))?\b"
+    rf"|\b{_MONTH}\s+(\d{{1,2}})(?:st|nd|rd|th)?\b(?:,?\s+(\d{{4}})\b)?",
+    re.IGNORECASE,
+)
+RELATIVE_DAY_PATTERN = re.compile(r"\b(today|tonight|tomorrow)\b", re.IGNORECASE)
+TIME_PATTERN = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s?(am|pm)\b|\b(\d{1,2}):(\d{2})\b", re.IGNORECASE)
+
+# Marketing rarely says so in IGNORE_KEYWORDS' words ("Join our free demo webinar");
+# the fast path wants positive signs of a personal or transactional email
+_PROMO_PATTERN = re.compile(
+    r"\b(?:free|webinar|demo|masterclass|register now|sign up|join (?:our|us)|limited|exclusive|"
+    r"deals?|giveaway|unsubscribe)\b|\d+\s?%",
+    re.IGNORECASE,
+)
+_BULK_SENDER_PATTERN = re.compile(
+    r"\b(?:news(?:letter)?s?|marketing|promo(?:tions?)?|offers?|deals|digest|events?|hello|info|community|mailer)"
+    r"(?:[-._]\w+)?@",
+    re.IGNORECASE,
+)
+
+# Changes to something already scheduled need judgment
+_AMBIGUOUS_PATTERN = re.compile(r"\b(?:cancel\w*|postpone\w*|reschedul\w*|tentative\w*|rsvp)\b|\?", re.IGNORECASE)
+_SUBJECT_PREFIX = re.compile(
+    r"^\s*(?:(?:re|fw|fwd|aw|urgent|important|reminder|action required)\s*[:!-]\s*|\[[^\]]*\]\s*)+", re.IGNORECASE
+)
+_CONNECTOR_TAIL = re.compile(r"(?:[\s,:;(\[-]|\b(?:on|at|by|before|for|from|is|of)\b)+$", re.IGNORECASE)
+
+
+def _keyword_pattern(keywords: list[str]) -> re.Pattern:
+    # Whole words only: "fee" must not match "feedback", nor "call" "recall"
+    alternatives = sorted((re.escape(k) for k in keywords), key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\b", re.IGNORECASE)
+
+
+_EVENT_RE = _keyword_pattern(EVENT_KEYWORDS)
+_DUE_RE = _keyword_pattern(FINANCIAL_KEYWORDS + DOCUMENT_KEYWORDS)
+# Only unambiguous deadline words; "by", "before" and "within" say little on their own
+_DEADLINE_RE = re.compile(
+    _keyword_pattern([k for k in DEADLINE_KEYWORDS if k not in ("due", "by", "before", "within", "prior to")]).pattern
+    + r"|\bdue\b(?!\s+to\b)",
+    re.IGNORECASE,
+)
+_ACTION_RE = _keyword_pattern(CORE_ACTION_KEYWORDS + PHRASE_KEYWORDS)
+_FOLLOW_UP_RE = _keyword_pattern(["respond", "reply required", "confirm", "kindly confirm", "please respond"])
+_URGENCY_RE = _keyword_pattern(URGENCY_KEYWORDS)
+_IGNORE_RE = _keyword_pattern(IGNORE_KEYWORDS)
+
+
+def _ambiguous_numeric_date(token: str) -> bool:
+    """True for 03/05/2026-style dates, which read differently as DMY and MDY."""
+    parts = re.split(r"[-/]", token)
+    if len(parts) != 3 or len(parts[0]) == 4:
+        return False
+    first, second = int(parts[0]), int(parts[1])
+    return first != second and first <= 12 and second <= 12
+
+
+def _numeric_date(token: str) -> date | None:
+    """A numeric date whose day/month order is unambiguous (see _ambiguous_numeric_date)."""
+    parts = re.split(r"[-/]", token)
+    if len(parts[0]) == 4:
+        year, month, day = map(int, parts)
+    else:
+        if _ambiguous_numeric_date(token):
+            return None
+        first, second, year = map(int, parts)
+        if year < 100:
+            year += 2000
+        if first > 12:
+            day, month = first, second
+        else:
+            month, day = first, second
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _next_occurrence(month: int, day: int, today: date) -> date | None:
+    for year in (today.year, today.year + 1):
+        try:
+            candidate = date(year, month, day)
+        except ValueError:
+            continue
+        if candidate >= today:
+            return candidate
+    return None
+
+
+def _find_dates(text: str, today: date) -> set[date]:
+    """Every calendar date mentioned in text (numeric, month-name or today/tomorrow)."""
+    found = set()
+    for match in DATE_PATTERN.finditer(text):
+        if ":" not in match.group():
+            parsed = _numeric_date(match.group())
+            if parsed:
+                found.add(parsed)
+    for match in MONTH_DATE_PATTERN.finditer(text):
+        day_a, month_a, year_a, month_b, day_b, year_b = match.groups()
+        month = _MONTHS[(month_a or month_b).lower()]
+        day, year = int(day_a or day_b), year_a or year_b
+        if year:
+            try:
+                found.add(date(int(year), month, day))
+            except ValueError:
+                pass
+        else:
+            parsed = _next_occurrence(month, day, today)
+            if parsed:
+                found.add(parsed)
+    for match in RELATIVE_DAY_PATTERN.finditer(text):
+        found.add(today + timedelta(days=1) if match.group(1).lower() == "tomorrow" else today)
+    return found
+
+
+def _find_time(text: str) -> str | None:
+    """First clock time in text as 24-hour HH:MM."""
+    for match in TIME_PATTERN.finditer(text):
+        hour_a, minute_a, meridiem, hour_b, minute_b = match.groups()
+        hour, minute = int(hour_a or hour_b), int(minute_a or minute_b or 0)
+        if meridiem:
+            if not 1 <= hour <= 12:
+                continue
+            hour = hour % 12 + (12 if meridiem.lower() == "pm" else 0)
+        if hour < 24 and minute < 60:
+            return f"{hour:02d}:{minute:02d}"
+    return None
+
+
+def _rule_title(subject: str) -> str:
+    title = _SUBJECT_PREFIX.sub("", subject)
+    for pattern in (DATE_PATTERN, MONTH_DATE_PATTERN, RELATIVE_DAY_PATTERN, TIME_PATTERN):
+        title = pattern.sub(" ", title)
+    title = re.sub(r"\(\s*\)|\[\s*\]", " ", title)
+    title = _CONNECTOR_TAIL.sub("", " ".join(title.split())).strip(" -,:;")
+    words = title.split()
+    if not words:
+        return subject.strip()
+    title = " ".join(words[:8])
+    return title[0].upper() + title[1:]
+
+
+def fast_extract_task(email: dict, today: date = None) -> dict | None:
     """
-    Use Groq AI to extract actionable tasks ONLY from keyword-matched emails.
-    Emails are pre-filtered by keywords before being sent to AI.
+    Build a task from a formulaic email without the model, or return None when
+    it is not clear-cut. Confident means: subject and snippet name exactly one
+    upcoming date, an event, payment/document or deadline keyword (or an action
+    plus the date) in the subject sets the category, and nothing suggests a
+    promotion or bulk sender, a cancellation, a question or a numeric date that
+    reads differently day-first and month-first (03/05/2026).
+    """
+    today = today or datetime.now().date()
+    subject = (email.get("subject") or "").strip()
+    if not subject:
+        return None
+    text = f"{subject} {email.get('snippet', '')}"
+
+    if _IGNORE_RE.search(text) or _AMBIGUOUS_PATTERN.search(text):
+        return None
+    if _PROMO_PATTERN.search(text) or _BULK_SENDER_PATTERN.search(email.get("sender") or ""):
+        return None
+    # Bulk mail carries an unsubscribe link somewhere in the body
+    if "unsubscribe" in (email.get("body") or email.get("body_html") or "").lower():
+        return None
+    if any(_ambiguous_numeric_date(m.group()) for m in DATE_PATTERN.finditer(text) if ":" not in m.group()):
+        return None
+
+    # The subject itself must say what the task is, since it becomes the title
+    if _EVENT_RE.search(subject):
+        category = "Meeting"
+    elif (_DUE_RE.search(subject) or (_DEADLINE_RE.search(subject) and _ACTION_RE.search(text))
+          or (_ACTION_RE.search(subject) and _find_dates(subject, today))):
+        category = "Follow-up" if _FOLLOW_UP_RE.search(text) else "Deadline"
+    else:
+        return None
+
+    dates = _find_dates(text, today)
+    if len(dates) != 1:
+        return None
+    due = dates.pop()
+    days_left = (due - today).days
+    if not 0 <= days_left <= 366:
+        return None
+
+    if _URGENCY_RE.search(text) or days_left <= 2:
+        priority = "high"
+    elif days_left <= 7 or category == "Deadline":
+        priority = "medium"
+    else:
+        priority = "low"
+
+    clock = _find_time(text)
+    title = _rule_title(subject)
+    sender = (email.get("sender") or "").split("<")[0].strip().strip('"') or "email"
+    # First sentence of the snippet says what to do; fall back to the title
+    summary = re.split(r"(?<=[.!])\s", " ".join((email.get("snippet") or "").split()), maxsplit=1)[0][:160]
+    summary = summary.rstrip(".!") or title
+    description = f"{summary} ({'at ' + clock + ', ' if clock else ''}from {sender})."
+    return {
+        "title": title,
+        "description": description,
+        "date": due.isoformat(),
+        "priority": priority,
+        "category": category,
+    }
+
+
+def split_fast_path(emails: list[dict], limit: int = 5) -> tuple[list[dict], list[dict]]:
+    """(tasks built by the rules, emails that still need the model); at most `limit` tasks."""
+    tasks, ambiguous = [], []
+    today = datetime.now().date()
+    for email in emails:
+        task = fast_extract_task(email, today) if len(tasks) < limit else None
+        if task is None:
+            ambiguous.append(email)
+        else:
+            tasks.append(task)
+    return tasks, ambiguous
+
+
+def extract_tasks_from_emails(emails: list[dict]) -> list[dict]:
+    """
+    Extract actionable tasks ONLY from keyword-matched emails (at most 5).
+    Clear-cut emails are handled by the rule-based fast path (FAST_EXTRACT=0
+    disables it); only the ambiguous remainder is sent to Groq.
+    Duplicates of existing tasks are dropped locally by task_manager (see dedup.py),
+    and calendar conflicts are checked locally (see free_busy.py), so neither
+    existing titles nor calendar events are sent to the model.
     """
     if not emails:
         return []
 
+    tasks, ambiguous = split_fast_path(emails) if FAST_EXTRACT else ([], emails)
+    TASK_EXTRACTIONS.inc(len(emails) - len(ambiguous), path="rules")
+    if ambiguous and len(tasks) < 5:
+        TASK_EXTRACTIONS.inc(len(ambiguous), path="llm")
+        tasks += _extract_with_llm(ambiguous)
+    return tasks[:5]
+
+
+def _extract_with_llm(emails: list[dict]) -> list[dict]:
+    """Use Groq AI to extract tasks from emails the rules could not handle."""
     # Build email summaries including matched keywords
+    # The salient body text (see gmail_service.salient_text) shares a fixed budget across emails
+    batch = emails[:10]
+    per_email = EMAIL_CONTENT_BUDGET // len(batch)
     email_summaries = []
-    for e in emails[:10]:
+    for e in batch:
         keywords_str = ", ".join(e.get("matched_keywords", [])[:5])
+        content = e.get("salient_text") or e.get("snippet", "")
+        if len(content) > per_email:
+            content = content[:per_email].rsplit(" ", 1)[0] + " …"
         email_summaries.append(
             f"- From: {e.get('sender', 'Unknown')}\n"
             f"  Subject: {e.get('subject', '')}\n"
-            f"  Snippet: {e.get('snippet', '')}\n"
+            f"  Content: {content}\n"
             f"  Matched Keywords: [{keywords_str}]"
         )
 
     emails_text = "\n".join(email_summaries)
 
-    # Build existing tasks context
-    existing_context = ""
-    if existing_titles:
-        existing_context = (
-            "\n\nEXISTING TASKS (do NOT create duplicates of these):\n"
-            + "\n".join(f"- {t}" for t in list(existing_titles)[:20])
-        )
-
-    # Build calendar context
-    calendar_context = ""
-    if calendar_events:
-        cal_items = [f"- {ev.get('title', '')} on {ev.get('start', '')}" for ev in calendar_events[:10]]
-        if cal_items:
-            calendar_context = (
-                "\n\nUPCOMING CALENDAR EVENTS (avoid scheduling conflicts):\n"
-                + "\n".join(cal_items)
-            )
-
     prompt = f"""You are analyzing emails that were pre-filtered by keywords.
 Each email has already been identified as containing actionable keywords.
 
 Rules:
 1. Create at MOST 5 tasks total.
 2. Create tasks ONLY for genuinely actionable items matching the keywords shown.
-3. Do NOT duplicate any existing tasks listed below.
-4. Consider calendar events to avoid scheduling conflicts.
-5. Today's date is {__import__('datetime').datetime.now().strftime('%Y-%m-%d')}.
+3. Today's date is {datetime.now().strftime('%Y-%m-%d')}.
 
 Emails:
 {emails_text}
-{existing_context}
-{calendar_context}
 
 For each task, return a JSON array with:
 - "title": short clear task title (max 8 words)
@@ -213,87 +471,111 @@ Return ONLY a valid JSON array. If no actionable tasks, return [].
 No markdown formatting, just raw JSON."""
 
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a smart task extraction assistant. You create tasks ONLY from emails that match specific keywords. Be selective — quality over quantity. Always respond with valid JSON only.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.2,
-            max_tokens=1500,
-        )
+        with observe_upstream("groq.extract"):
+            response = get_client().chat.completions.create(
+                model=MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a smart task extraction assistant. You create tasks ONLY from emails that match specific keywords. Be selective — quality over quantity. Always respond with valid JSON only.",
+                    },
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.2,
+                max_tokens=1500,
+            )
+        record_llm_usage(getattr(response, "usage", None))
 
         content = response.choices[0].message.content.strip()
 
-        # Clean markdown code blocks if present
-        if content.startswith("```"):
-            content = content.split("\n", 1)[1]
-            content = content.rsplit("```", 1)[0]
-            content = content.strip()
+        with span("ai.parse_response"):
+            # Clean markdown code blocks if present
+            if content.startswith("```"):
+                content = content.split("\n", 1)[1]
+                content = content.rsplit("```", 1)[0]
+                content = content.strip()
 
-        tasks = json.loads(content)
+            tasks = json.loads(content)
         if isinstance(tasks, list):
             return tasks[:5]  # Hard cap at 5
         return []
 
     except json.JSONDecodeError as e:
-        print(f"Failed to parse AI response as JSON: {e}")
+        logger.warning(f"Failed to parse AI response as JSON: {e}", extra={"upstream": "groq"})
         return []
     except Exception as e:
-        print(f"Groq AI error: {e}")
+        logger.error(f"Groq AI error: {e}", extra={"upstream": "groq"})
         return []
 
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# CHAT
+# ═══════════════════════════════════════════════════════════════════════════════
 
-def chat_response(user_message: str, context: str = "") -> str:
-    """Get an AI chat response for the floating assistant with rich knowledge."""
-    
-    system_prompt = """You are **DigiTwin AI**, a "Smart Life Agent" designed to be a digital counterpart for students and professionals.
-    
-    # 🎯 YOUR MISSION
-    "To be more than just a tool—a digital counterpart that understands context, manages workload, and autonomously handles the mundane, leaving users free to focus on what truly matters."
-    
-    # 👥 YOUR CREATORS (THE TEAM)
-    You were built by a team of passionate B.Tech students for the **Google AI Agentathon**:
-    - **Lohitha (The Architect)**: 3rd year Data Science student at CMR Technical Campus. She designed your core structure and scalability.
-    - **Chandana (The R&D)**: 2nd year IT student at Malla Reddy College. She leads research on cutting-edge AI technologies.
-    - **Uday (Frontend Developer)**: 3rd year CSM student at Vardhaman College of Engineering. He crafted your beautiful UI/UX.
-    - **Manikanta (Backend Developer)**: 3rd year CSE student at CMR Technical Campus. He built your robust backend and AI logic.
-    
-    # ⚡ YOUR CAPABILITIES
-    1. **Task Extraction**: You scan emails for keywords (exams, meetings, assignments) and auto-create actionable tasks.
-    2. **Calendar Sync**: You check Google Calendar for conflicts before scheduling.
-    3. **Priority Management**: You organize tasks by priority (High, Medium, Low) on a drag-and-drop board.
-    4. **Cognitive Offloading**: You help reduce mental fatigue by tracking deadlines and "remembering" things for the user.
-    
-    # 🧠 YOUR PERSONALITY
-    - Friendly, intelligent, and proactive.
-    - You use emojis occasionally to keep things light (📅, ✅, 🚀).
-    - You prioritize "Deep Work" and helping the user stay focused.
-    
-    If the user asks "What can you do?" or "Who built you?", use the info above.
-    Keep responses concise (2-3 sentences) unless asked for detail.
-    """
+# Built once: the static persona is the same for every chat request
+CHAT_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": """You are **DigiTwin AI**, a "Smart Life Agent" designed to be a digital counterpart for students and professionals.
+
+# 🎯 YOUR MISSION
+"To be more than just a tool—a digital counterpart that understands context, manages workload, and autonomously handles the mundane, leaving users free to focus on what truly matters."
+
+# 👥 YOUR CREATORS (THE TEAM)
+You were built by a team of passionate B.Tech students for the **Google AI Agentathon**:
+- **Lohitha (The Architect)**: 3rd year Data Science student at CMR Technical Campus. She designed your core structure and scalability.
+- **Chandana (The R&D)**: 2nd year IT student at Malla Reddy College. She leads research on cutting-edge AI technologies.
+- **Uday (Frontend Developer)**: 3rd year CSM student at Vardhaman College of Engineering. He crafted your beautiful UI/UX.
+- **Manikanta (Backend Developer)**: 3rd year CSE student at CMR Technical Campus. He built your robust backend and AI logic.
+
+# ⚡ YOUR CAPABILITIES
+1. **Task Extraction**: You scan emails for keywords (exams, meetings, assignments) and auto-create actionable tasks.
+2. **Calendar Sync**: You check Google Calendar for conflicts before scheduling.
+3. **Priority Management**: You organize tasks by priority (High, Medium, Low) on a drag-and-drop board.
+4. **Cognitive Offloading**: You help reduce mental fatigue by tracking deadlines and "remembering" things for the user.
+
+# 🧠 YOUR PERSONALITY
+- Friendly, intelligent, and proactive.
+- You use emojis occasionally to keep things light (📅, ✅, 🚀).
+- You prioritize "Deep Work" and helping the user stay focused.
+
+If the user asks "What can you do?" or "Who built you?", use the info above.
+Keep responses concise (2-3 sentences) unless asked for detail.""",
+}
+
+# Characters of task context sent with a chat message (~4 chars per token)
+CHAT_CONTEXT_BUDGET = int(os.getenv("CHAT_CONTEXT_BUDGET", "1200"))
+
+
+def build_task_context(tasks: list[dict], budget: int = CHAT_CONTEXT_BUDGET) -> str:
+    """One line per task, most relevant first, stopping before the character budget."""
+    lines, used = [], 0
+    for t in tasks:
+        line = f"- {t.get('title', '')} (priority: {t.get('priority', 'medium')}, date: {t.get('date', 'N/A')}"
+        line += f", {t['status']})" if t.get("status") == "completed" else ")"
+        if used + len(line) + 1 > budget:
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines)
 
-    messages = [{"role": "system", "content": system_prompt}]
 
+def chat_response(user_message: str, context: str = "") -> str:
+    """Get an AI chat response for the floating assistant; context is the user's relevant tasks."""
+    messages = [CHAT_SYSTEM_MESSAGE]
     if context:
-        messages.append({"role": "user", "content": f"Here is my current context:\n{context}"})
-        messages.append({"role": "assistant", "content": "Got it! I have your current context. How can I help?"})
-
+        messages.append({"role": "system", "content": f"The user's tasks most relevant to this message:\n{context}"})
     messages.append({"role": "user", "content": user_message})
 
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.7,
-            max_tokens=500,
-        )
+        with observe_upstream("groq.chat"):
+            response = get_client().chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500,
+            )
+        record_llm_usage(getattr(response, "usage", None))
         return response.choices[0].message.content.strip()
     except Exception as e:
-        print(f"Chat error: {e}")
+        logger.error(f"Chat error: {e}", extra={"upstream": "groq"})
         return "Sorry, I'm having trouble responding right now. Please try again in a moment."
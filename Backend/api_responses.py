@@ -0,0 +1,216 @@
+"""
+Response plumbing: fast JSON rendering, conditional GETs and compression.
+
+- FastJSONResponse renders with orjson when it is installed (the default
+  response class for the app), falling back to the stdlib encoder.
+- conditional_json() adds a strong ETag (hash of the rendered body) and answers
+  a matching If-None-Match with 304, so unchanged polls send no body.
+- CompressionMiddleware gzip- or brotli-compresses complete responses above a
+  size threshold. brotli is optional; without it only gzip is offered. Every
+  compressible response carries Vary: Accept-Encoding, compressed or not, and
+  large bodies are compressed on a worker thread.
+"""
+import os
+import gzip
+import json
+import hashlib
+import anyio.to_thread
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# Bodies at least this large are compressed off the event loop
+COMPRESS_THREAD_MIN_BYTES = int(os.getenv("COMPRESS_THREAD_MIN_BYTES", str(64 * 1024)))
+
+# Content types worth compressing; only these get Vary: Accept-Encoding
+_COMPRESSIBLE_TYPES = (b"application/json", b"text/", b"application/javascript", b"application/xml", b"image/svg+xml")
+
+# Encodings are appended to the ETag of a compressed variant ("<hash>-gzip"),
+# keeping each representation's tag strong and still matching on revalidation
+_ENCODING_SUFFIXES = ("-gzip", "-br")
+
+
+def dumps(content) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _normalize_etag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for suffix in _ENCODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)]
+    return tag
+
+
+def conditional_json(request, content, headers: dict | None = None) -> Response:
+    """
+    JSON response with a strong, content-derived ETag.
+    Returns 304 Not Modified when the client's If-None-Match already names it.
+    """
+    body = dumps(content)
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    response_headers = {"ETag": f'"{digest}"', "Cache-Control": "private, no-cache", **(headers or {})}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {_normalize_etag(t) for t in if_none_match.split(",")}
+        if digest in tags or "*" in tags:
+            return Response(status_code=304, headers=response_headers)
+
+    return Response(content=body, media_type="application/json", headers=response_headers)
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if name and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _compressible(headers: dict) -> bool:
+    content_type = headers.get(b"content-type", b"")
+    return content_type.startswith(_COMPRESSIBLE_TYPES) and not content_type.startswith(b"text/event-stream")
+
+
+def _with_vary(headers: list) -> list:
+    """Headers with Accept-Encoding added to Vary (merged into an existing Vary)."""
+    out, found = [], False
+    for k, v in headers:
+        if k.lower() == b"vary":
+            found = True
+            if b"accept-encoding" not in v.lower() and v.strip() != b"*":
+                v = v + b", Accept-Encoding"
+        out.append((k, v))
+    if not found:
+        out.append((b"vary", b"Accept-Encoding"))
+    return out
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Compresses JSON/text responses of at least `minimum_size` bytes with brotli
+    (when installed and accepted) or gzip. Server-Sent Events streams and
+    already-encoded bodies pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        accepted = _accepted_encodings(accept)
+        if brotli is not None and "br" in accepted:
+            encoding = "br"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        else:
+            # Nothing to compress for this client, but shared caches must still
+            # keep its uncompressed variant apart from the compressed ones
+            async def send_with_vary(message):
+                if message["type"] == "http.response.start":
+                    headers = message.get("headers", [])
+                    if _compressible({k.lower(): v for k, v in headers}):
+                        message = {**message, "headers": _with_vary(list(headers))}
+                await send(message)
+
+            await self.app(scope, receive, send_with_vary)
+            return
+
+        start_message = None
+        chunks = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                # Event streams must flush as they go; encoded bodies are left alone
+                if b"content-encoding" in headers or headers.get(b"content-type", b"").startswith(b"text/event-stream"):
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            # Middleware in front of the routes may deliver a complete body in several chunks
+            chunks.append(message.get("body", b""))
+            if message.get("more_body"):
+                return
+            body = b"".join(chunks)
+            headers = list(start_message.get("headers", []))
+            compressible = _compressible({k.lower(): v for k, v in headers})
+            if not compressible or len(body) < self.minimum_size:
+                if compressible:
+                    start_message = {**start_message, "headers": _with_vary(headers)}
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            if len(body) >= COMPRESS_THREAD_MIN_BYTES:
+                compressed = await anyio.to_thread.run_sync(_compress, body, encoding)
+            else:
+                compressed = _compress(body, encoding)
+
+            suffix = b"-br" if encoding == "br" else b"-gzip"
+            out = []
+            for k, v in headers:
+                key = k.lower()
+                if key == b"content-length":
+                    continue
+                if key == b"etag" and v.endswith(b'"'):
+                    v = v[:-1] + suffix + b'"'
+                out.append((k, v))
+            out = _with_vary(out) + [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+            ]
+            await send({**start_message, "headers": out})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
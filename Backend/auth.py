@@ -3,56 +3,103 @@ Firebase Auth — verifies Firebase ID tokens and manages Google access tokens f
 No custom OAuth flow needed — Firebase handles everything on the frontend.
 """
 import os
+import time
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
-from firebase_admin import auth as firebase_auth
+import firebase_config
+from cache import get_cache, fingerprint
+from log_config import get_logger
+from metrics import record_cache
 
 load_dotenv()
 
+logger = get_logger("auth")
+
+# Credentials per Google access token, so a user's requests share one object
+# (and with it the cached Gmail / Calendar services in google_api)
+CREDENTIALS_CACHE_SIZE = int(os.getenv("CREDENTIALS_CACHE_SIZE", "256"))
+_credentials = OrderedDict()
+_credentials_lock = threading.Lock()
+
+# Verified ID tokens are cached (shared across workers with CACHE_BACKEND=sqlite)
+# for at most this long, and never past the token's own expiry
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "300"))
+
 
 def verify_firebase_token(id_token: str) -> dict | None:
     """
     Verify a Firebase ID token and return user info.
     Returns { uid, email, name } or None if invalid.
+    Successful verifications are cached by token fingerprint (TOKEN_CACHE_TTL).
     """
+    if not id_token:
+        return None
+    user, _ = get_cache().get_or_compute(
+        ("firebase_token", fingerprint(id_token)),
+        lambda: _verify_token(id_token),
+        ttl=lambda result: min(TOKEN_CACHE_TTL, result[1] - time.time()) if result[0] else 0,
+    )
+    return user
+
+
+def _verify_token(id_token: str) -> tuple[dict | None, float]:
+    """Returns (user, expires_at); user is None if the token is invalid."""
     try:
+        firebase_config.init_firebase()
+        from firebase_admin import auth as firebase_auth
         decoded = firebase_auth.verify_id_token(id_token)
         return {
             "uid": decoded.get("uid", ""),
             "email": decoded.get("email", ""),
             "name": decoded.get("name", ""),
             "picture": decoded.get("picture", ""),
-        }
+        }, decoded.get("exp", 0)
     except Exception as e:
-        print(f"❌ Firebase verify failed: {e}")
+        logger.debug(f"❌ Firebase verify failed: {e}")
         # For Hybrid Auth debugging:
         try:
             # Try to verify as generic Google token (since we used external Client ID)
             from google.oauth2 import id_token
             from google.auth.transport import requests
             payload = id_token.verify_oauth2_token(id_token, requests.Request())
-            print(f"✅ Verified as Generic Google Token: {payload.get('email')}")
+            logger.debug("✅ Verified as Generic Google Token")
             return {
                 "uid": payload.get("sub"),
                 "email": payload.get("email"),
                 "name": payload.get("name"),
                 "picture": payload.get("picture"),
-            }
+            }, payload.get("exp", 0)
         except Exception as e2:
-            print(f"❌ Generic Google verify also failed: {e2}")
+            logger.warning(f"❌ Firebase verify failed: {e}; generic Google verify also failed: {e2}")
         
-        return None
+        return None, 0
 
 
 def get_gmail_credentials(google_access_token: str):
     """
     Create Google credentials from a Google access token.
     Used for Gmail API access.
+    Cached per token (LRU, CREDENTIALS_CACHE_SIZE); a refreshed token is a new key.
     """
     if not google_access_token:
         return None
 
+    with _credentials_lock:
+        creds = _credentials.get(google_access_token)
+        if creds is not None:
+            _credentials.move_to_end(google_access_token)
+    record_cache("credentials", creds is not None)
+    if creds is not None:
+        return creds
+
     from google.oauth2.credentials import Credentials
-    return Credentials(token=google_access_token)
+    creds = Credentials(token=google_access_token)
+    with _credentials_lock:
+        creds = _credentials.setdefault(google_access_token, creds)
+        while len(_credentials) > CREDENTIALS_CACHE_SIZE:
+            _credentials.popitem(last=False)
+    return creds
 
 
 def exchange_code_for_token(code: str, redirect_uri: str) -> str:
@@ -78,7 +125,7 @@ def exchange_code_for_token(code: str, redirect_uri: str) -> str:
                     client_id = web.get("client_id")
                     client_secret = web.get("client_secret")
             else:
-                print("❌ No GOOGLE_CLIENT_ID/SECRET env vars and no credentials.json found!")
+                logger.error("❌ No GOOGLE_CLIENT_ID/SECRET env vars and no credentials.json found!")
                 return None
 
         # Direct token exchange with Google
@@ -94,22 +141,20 @@ def exchange_code_for_token(code: str, redirect_uri: str) -> str:
         )
 
         if token_response.status_code != 200:
-            print(f"❌ Token exchange failed: {token_response.status_code} - {token_response.text}")
+            logger.error(f"❌ Token exchange failed: {token_response.status_code} - {token_response.text}")
             return None
 
         token_data = token_response.json()
         access_token = token_data.get("access_token")
         
         if access_token:
-            print(f"✅ Token exchange successful, got access_token (len={len(access_token)})")
+            logger.info(f"✅ Token exchange successful, got access_token (len={len(access_token)})")
             return access_token
         else:
-            print(f"❌ No access_token in response: {token_data}")
+            logger.error(f"❌ No access_token in response: {token_data}")
             return None
 
     except Exception as e:
-        print(f"❌ Token exchange error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Token exchange error: {e}")
         return None
 
@@ -0,0 +1,162 @@
+"""
+Offline end-to-end API benchmark.
+Drives main.app in-process (httpx ASGI transport) against the fakes in
+benchmarks/fakes.py and reports p50/p95/p99 latency and requests/sec per endpoint
+as JSON, so runs can be compared between commits.
+
+Run from the Backend directory:
+    python -m benchmarks.bench_api --concurrency 16 --requests 200 --output bench.json
+    python -m benchmarks.bench_api --compare bench.json      # fail on p95 regressions
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+from dataclasses import asdict, fields
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_FILE", os.devnull)
+
+import httpx  # noqa: E402
+from benchmarks.fakes import FakeConfig, install_fakes, bearer_token  # noqa: E402
+
+ENDPOINTS = {
+    "/emails": ("GET", None),
+    "/tasks": ("GET", None),
+    "/calendar/events": ("GET", None),
+    "/agent/run": ("POST", None),
+    "/chat": ("POST", {"message": "What should I work on today?"}),
+}
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_endpoint(client: httpx.AsyncClient, path: str, total: int, concurrency: int, users: int) -> dict:
+    method, body = ENDPOINTS[path]
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            headers = {"Authorization": f"Bearer {bearer_token(i % users)}", "X-Google-Token": "bench"}
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=headers, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "concurrency": concurrency,
+        "rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+async def run(args, config: FakeConfig) -> dict:
+    import main
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for path in args.endpoints:
+            if args.warmup:
+                await run_endpoint(client, path, args.warmup, min(args.warmup, args.concurrency), config.users)
+            results[path] = await run_endpoint(client, path, args.requests, args.concurrency, config.users)
+            print(f"{path:18} p50={results[path]['p50_ms']:>9.2f}ms  p95={results[path]['p95_ms']:>9.2f}ms  "
+                  f"p99={results[path]['p99_ms']:>9.2f}ms  {results[path]['rps']:>8.2f} req/s  "
+                  f"errors={results[path]['errors']}", file=sys.stderr)
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """Endpoints whose p95 got worse than baseline by more than `tolerance` (fraction)."""
+    regressions = []
+    for path, now in current["results"].items():
+        before = baseline.get("results", {}).get(path)
+        if not before or not before.get("p95_ms"):
+            continue
+        change = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"]
+        if change > tolerance:
+            regressions.append(f"{path}: p95 {before['p95_ms']}ms → {now['p95_ms']}ms (+{change:.0%})")
+    return regressions
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per endpoint")
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p95 regression (fraction)")
+    for f in fields(FakeConfig):
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=type(f.default), default=f.default)
+    args = parser.parse_args(argv)
+
+    config = FakeConfig(**{f.name: getattr(args, f.name) for f in fields(FakeConfig)})
+    install_fakes(config)
+
+    results = asyncio.run(run(args, config))
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {**asdict(config), "requests": args.requests, "concurrency": args.concurrency},
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
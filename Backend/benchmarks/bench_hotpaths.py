@@ -0,0 +1,222 @@
+"""
+Microbenchmarks for the CPU hot paths in ai_engine and gmail_service.
+Synthetic corpora cover the realistic range of email sizes — one-line
+notifications, ordinary messages, and multi-megabyte HTML newsletters with
+attachments and deeply nested multipart trees. Each benchmark reports ops/sec
+and the peak memory allocated by one operation (tracemalloc).
+
+Run from the Backend directory:
+    python -m benchmarks.bench_hotpaths --output hotpaths.json
+    python -m benchmarks.bench_hotpaths --filter extract_body --compare hotpaths.json
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import platform
+import tracemalloc
+from datetime import date, datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_FILE", os.devnull)
+
+from benchmarks.bench_api import git_commit  # noqa: E402
+
+WORDS = (
+    "please submit the report before friday meeting invoice payment due review project "
+    "team update schedule newsletter offer discount exam assignment deadline reminder "
+    "attend interview confirm schedule quarterly results thanks regards hello team"
+).split()
+
+# (name, body bytes, html?, attachments, nesting depth)
+SIZE_CLASSES = [
+    ("tiny", 300, False, 0, 1),
+    ("typical", 6_000, True, 0, 2),
+    ("with_attachments", 40_000, True, 3, 3),
+    ("deeply_nested", 20_000, True, 2, 12),
+    ("newsletter_5mb", 5_000_000, True, 4, 3),
+]
+
+
+def _text(rng: random.Random, size: int) -> str:
+    out, total = [], 0
+    while total < size:
+        if rng.random() < 0.02:
+            word = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2026"
+        else:
+            word = rng.choice(WORDS)
+        out.append(word)
+        total += len(word) + 1
+    return " ".join(out)[:size]
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii")
+
+
+def make_payload(rng: random.Random, size: int, html: bool, attachments: int, depth: int) -> dict:
+    """A Gmail `payload` tree: nested multipart/mixed → alternative(text, html) + attachments."""
+    text = _text(rng, size if not html else max(200, size // 5))
+    leaf = {"mimeType": "text/plain", "body": {"data": _b64(text.encode())}}
+    alternative = {"mimeType": "multipart/alternative", "parts": [leaf]}
+    if html:
+        html_doc = "<html><body>" + "".join(
+            f"<div class='row'><p style='color:#333'>{_text(rng, 400)}</p></div>"
+            for _ in range(max(1, size // 450))
+        ) + "</body></html>"
+        alternative["parts"].append({"mimeType": "text/html", "body": {"data": _b64(html_doc.encode())}})
+
+    node = alternative
+    for _ in range(depth - 1):
+        node = {"mimeType": "multipart/mixed", "parts": [node]}
+    for i in range(attachments):
+        node["parts"].append({
+            "mimeType": "application/pdf",
+            "filename": f"file{i}.pdf",
+            "headers": [{"name": "Content-Disposition", "value": f'attachment; filename="file{i}.pdf"'}],
+            "body": {"attachmentId": f"att-{i}", "size": 250_000},
+        })
+    node["headers"] = [{"name": "Subject", "value": "Benchmark"}]
+    return node
+
+
+def make_emails(rng: random.Random, n: int) -> list[dict]:
+    """Email dicts as gmail_service.fetch_emails returns them (subject/snippet/sender/body)."""
+    emails = []
+    for i in range(n):
+        subject = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 9))).capitalize()
+        body = _text(rng, int(rng.lognormvariate(7.5, 1.2)))
+        emails.append({
+            "id": f"m{i}",
+            "sender": f"Sender {i} <s{i}@example.com>",
+            "subject": subject,
+            "snippet": body[:200],
+            "body": body,
+            "body_html": "",
+            "date": "",
+        })
+    return emails
+
+
+def measure(fn, min_time: float) -> dict:
+    """ops/sec over at least `min_time` seconds, plus peak memory of a single call."""
+    fn()  # warm up
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(runs / elapsed, 2),
+        "us_per_op": round(elapsed / runs * 1e6, 2),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def build_benchmarks(rng: random.Random) -> dict:
+    import ai_engine
+    import free_busy
+    import gmail_service
+    from benchmarks.fakes import FakeConfig, FakeGroq, SUBJECTS
+
+    benches = {}
+
+    emails = make_emails(rng, 200)
+    benches["email_matches_keywords[200 emails]"] = lambda: [ai_engine._email_matches_keywords(e) for e in emails]
+    benches["filter_emails_by_keywords[200 emails]"] = lambda: ai_engine.filter_emails_by_keywords([dict(e) for e in emails])
+
+    for name, size in (("1kb", 1_000), ("50kb", 50_000), ("1mb", 1_000_000)):
+        text = _text(rng, size)
+        benches[f"date_pattern_findall[{name}]"] = lambda t=text: ai_engine.DATE_PATTERN.findall(t)
+
+    # Prompt building: the Groq call is a zero-latency stub, so this times prompt assembly + response parsing
+    ai_engine.client = FakeGroq(FakeConfig(groq_ms=0, jitter=0))
+    matched = ai_engine.filter_emails_by_keywords([dict(e) for e in emails])[:10]
+    benches["extract_tasks_prompt[10 emails]"] = lambda: ai_engine.extract_tasks_from_emails(matched)
+
+    # Rule-based fast path over formulaic subjects (the mix /agent/run sees in the API benchmark)
+    formulaic = [
+        {**e, "subject": SUBJECTS[i % len(SUBJECTS)].format(date="%02d/11/2026" % (i % 28 + 1))}
+        for i, e in enumerate(emails)
+    ]
+    benches["split_fast_path[200 emails]"] = lambda: ai_engine.split_fast_path(formulaic, limit=len(formulaic))
+
+    # Calendar conflict check: index a month of events and check a batch of task dates
+    events = [
+        {"id": f"ev{i}", "title": f"Event {i}",
+         "start": "2026-11-%02dT%02d:00:00+05:30" % (i % 30 + 1, 8 + i % 10),
+         "end": "2026-11-%02dT%02d:30:00+05:30" % (i % 30 + 1, 9 + i % 10)}
+        for i in range(250)
+    ]
+    tasks = [{"id": f"t{i}", "title": f"Task {i}", "date": "2026-11-%02d" % (i * 6 + 1)} for i in range(5)]
+    benches["free_busy_check[250 events, 5 tasks]"] = lambda: free_busy.check_tasks(
+        tasks, free_busy.FreeBusyIndex(events), today=date(2026, 11, 1))
+
+    for name, size, html, attachments, depth in SIZE_CLASSES:
+        payload = make_payload(rng, size, html, attachments, depth)
+        benches[f"extract_body[{name}]"] = lambda p=payload: gmail_service._extract_body(p)
+
+    return benches
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds per benchmark")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON; exit 1 if ops/sec dropped beyond --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, fn in build_benchmarks(random.Random(args.seed)).items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(fn, args.min_time)
+        r = results[name]
+        print(f"{name:42} {r['ops_per_sec']:>12.2f} ops/s  {r['us_per_op']:>12.2f} µs/op  "
+              f"peak {r['peak_kib']:>10.1f} KiB", file=sys.stderr)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = [
+            f"{name}: {baseline[name]['ops_per_sec']} → {r['ops_per_sec']} ops/s"
+            for name, r in results.items()
+            if name in baseline and r["ops_per_sec"] < baseline[name]["ops_per_sec"] * (1 - args.tolerance)
+        ]
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
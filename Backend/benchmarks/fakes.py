@@ -0,0 +1,439 @@
+"""
+In-process fakes for the Gmail API, the Calendar API, Firestore and Groq.
+They mimic just enough of each client's surface for the backend modules, with
+configurable per-call latency and payload sizes, so the API can be benchmarked
+without real accounts or network access.
+
+    from benchmarks.fakes import FakeConfig, install_fakes
+    install_fakes(FakeConfig(gmail_ms=40, groq_ms=800))
+"""
+import json
+import re
+import time
+import base64
+import random
+import threading
+from dataclasses import dataclass
+from types import SimpleNamespace
+from google.api_core.exceptions import NotFound
+
+
+@dataclass
+class FakeConfig:
+    gmail_ms: float = 40.0          # per Gmail API call
+    calendar_ms: float = 30.0       # per Calendar API call
+    firestore_ms: float = 8.0       # per Firestore RPC
+    groq_ms: float = 600.0          # per chat completion
+    jitter: float = 0.2             # ± fraction applied to every latency
+    users: int = 20
+    emails_per_inbox: int = 25
+    body_bytes: int = 8_000         # text/html body size per email
+    calendars: int = 3
+    events_per_calendar: int = 15
+    tasks_per_user: int = 40
+    seed: int = 7
+
+
+def _sleep(ms: float, jitter: float) -> None:
+    if ms > 0:
+        time.sleep(ms * random.uniform(1 - jitter, 1 + jitter) / 1000)
+
+
+class _Call:
+    """Mimics a googleapiclient HttpRequest: work happens on execute()."""
+
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self, *args, **kwargs):
+        return self._fn()
+
+
+# ─── Gmail ───────────────────────────────────────────────────────────────────
+
+SUBJECTS = [
+    "Submit DBMS assignment before {date}",
+    "Interview scheduled at 10:30 am",
+    "Invoice due {date}",
+    "Team meeting moved to Thursday",
+    "Weekly newsletter: top offers inside",
+    "Please review the project report",
+    "Your order has shipped",
+    "Reminder: fee payment deadline {date}",
+]
+
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+def make_message(msg_id: str, rng: random.Random, body_bytes: int) -> dict:
+    day, month = rng.randint(1, 28), rng.randint(1, 12)
+    subject = rng.choice(SUBJECTS).format(date=f"{day:02d}/{month:02d}/2026")
+    paragraph = "Please make sure to complete the required steps before the deadline. "
+    text = (paragraph * (body_bytes // len(paragraph) + 1))[:body_bytes]
+    html = f"<html><body><p>{text}</p><div class='footer'>Unsubscribe</div></body></html>"
+    return {
+        "id": msg_id,
+        "snippet": f"{subject} — {text[:120]}",
+        "payload": {
+            "mimeType": "multipart/mixed",
+            "headers": [
+                {"name": "From", "value": f"Sender {rng.randint(1, 50)} <sender@example.com>"},
+                {"name": "Subject", "value": subject},
+                {"name": "Date", "value": "Mon, 5 Oct 2026 09:00:00 +0530"},
+            ],
+            "parts": [
+                {
+                    "mimeType": "multipart/alternative",
+                    "parts": [
+                        {"mimeType": "text/plain", "body": {"data": _b64(text)}},
+                        {"mimeType": "text/html", "body": {"data": _b64(html)}},
+                    ],
+                },
+                {
+                    "mimeType": "application/pdf",
+                    "filename": "attachment.pdf",
+                    "body": {"attachmentId": f"att-{msg_id}", "size": 120_000},
+                },
+            ],
+        },
+    }
+
+
+class FakeGmailService:
+    def __init__(self, config: FakeConfig, mailbox: list[dict]):
+        self.config = config
+        self.mailbox = mailbox
+        self._by_id = {m["id"]: m for m in mailbox}
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, userId="me", maxResults=100, labelIds=None, q=None, pageToken=None, **kwargs):
+        def run():
+            _sleep(self.config.gmail_ms, self.config.jitter)
+            matching = [m for m in self.mailbox if _matches_query(m, q)]
+            return {"messages": [{"id": m["id"], "threadId": m["id"]} for m in matching[:maxResults]]}
+        return _Call(run)
+
+    def get(self, userId="me", id=None, format="full", **kwargs):
+        def run():
+            _sleep(self.config.gmail_ms, self.config.jitter)
+            return self._by_id[id]
+        return _Call(run)
+
+
+def _matches_query(message: dict, q: str | None) -> bool:
+    """Rough Gmail search: any {…} term (word or "phrase") in the snippet; operators are ignored."""
+    if not q or "{" not in q:
+        return True
+    group = q[q.index("{") + 1:q.rindex("}")]
+    terms = re.findall(r'"([^"]+)"|(\S+)', group)
+    text = message["snippet"].lower()
+    return any(re.search(rf"\b{re.escape(phrase or word)}\b", text) for phrase, word in terms)
+
+
+# ─── Calendar ────────────────────────────────────────────────────────────────
+
+class FakeCalendarService:
+    def __init__(self, config: FakeConfig, calendars: list[dict], events: dict[str, list[dict]]):
+        self.config = config
+        self._calendars = calendars
+        self._events = events
+
+    def calendarList(self):
+        return SimpleNamespace(list=lambda **kw: _Call(self._list_calendars))
+
+    def events(self):
+        return SimpleNamespace(list=self._list_events)
+
+    def _list_calendars(self):
+        _sleep(self.config.calendar_ms, self.config.jitter)
+        return {"items": self._calendars}
+
+    def _list_events(self, calendarId=None, maxResults=250, **kwargs):
+        def run():
+            _sleep(self.config.calendar_ms, self.config.jitter)
+            return {"items": self._events.get(calendarId, [])[:maxResults]}
+        return _Call(run)
+
+
+def make_calendar(config: FakeConfig, rng: random.Random) -> tuple[list[dict], dict]:
+    calendars, events = [], {}
+    for c in range(config.calendars):
+        cal_id = f"cal-{c}"
+        calendars.append({"id": cal_id, "summary": f"Calendar {c}", "primary": c == 0, "backgroundColor": "#4285f4"})
+        items = []
+        for e in range(config.events_per_calendar):
+            day = rng.randint(1, 28)
+            if rng.random() < 0.2:
+                start, end = {"date": f"2026-11-{day:02d}"}, {"date": f"2026-11-{day:02d}"}
+            else:
+                hour = rng.randint(8, 18)
+                start = {"dateTime": f"2026-11-{day:02d}T{hour:02d}:00:00+05:30"}
+                end = {"dateTime": f"2026-11-{day:02d}T{hour:02d}:45:00+05:30"}
+            items.append({"id": f"{cal_id}-ev{e}", "summary": f"Event {e}", "start": start, "end": end})
+        events[cal_id] = items
+    return calendars, events
+
+
+# ─── Firestore ───────────────────────────────────────────────────────────────
+
+class FakeSnapshot:
+    def __init__(self, ref: "FakeDocumentRef", data: dict | None):
+        self.reference = ref
+        self.id = ref.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self) -> dict | None:
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocumentRef:
+    def __init__(self, db: "FakeFirestore", path: tuple):
+        self._db = db
+        self._path = path
+        self.id = path[-1]
+
+    def collection(self, name: str) -> "FakeQuery":
+        return FakeQuery(self._db, self._path + (name,))
+
+    def get(self, **kwargs) -> FakeSnapshot:
+        self._db.rpc()
+        return FakeSnapshot(self, self._db.read(self._path))
+
+    def set(self, data: dict, **kwargs) -> None:
+        self._db.rpc()
+        self._db.write(self._path, dict(data))
+
+    def update(self, fields: dict, **kwargs) -> None:
+        self._db.rpc()
+        self._db.update(self._path, fields)
+
+    def delete(self, option=None, **kwargs) -> None:
+        self._db.rpc()
+        self._db.delete(self._path, must_exist=option is not None)
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeFirestore", path: tuple, filters=(), order=None, limit=None):
+        self._db = db
+        self._path = path
+        self._filters = filters
+        self._order = order
+        self._limit = limit
+
+    def document(self, doc_id: str) -> FakeDocumentRef:
+        return FakeDocumentRef(self._db, self._path + (doc_id,))
+
+    def where(self, field: str, op: str, value) -> "FakeQuery":
+        assert op == "==", "only equality filters are faked"
+        return FakeQuery(self._db, self._path, self._filters + ((field, value),), self._order, self._limit)
+
+    def order_by(self, field: str, **kwargs) -> "FakeQuery":
+        return FakeQuery(self._db, self._path, self._filters, field, self._limit)
+
+    def limit(self, n: int) -> "FakeQuery":
+        return FakeQuery(self._db, self._path, self._filters, self._order, n)
+
+    def stream(self, **kwargs):
+        self._db.rpc()
+        docs = self._db.list(self._path)
+        docs = [(i, d) for i, d in docs if all(d.get(f) == v for f, v in self._filters)]
+        if self._order:
+            docs.sort(key=lambda item: item[1].get(self._order, ""))
+        if self._limit:
+            docs = docs[:self._limit]
+        return iter([FakeSnapshot(self.document(i), d) for i, d in docs])
+
+
+class FakeBatch:
+    def __init__(self, db: "FakeFirestore"):
+        self._db = db
+        self._ops = []
+
+    def set(self, ref: FakeDocumentRef, data: dict, merge=False, **kwargs):
+        self._ops.append(("merge" if merge else "set", ref._path, dict(data), None))
+
+    def update(self, ref: FakeDocumentRef, fields: dict, **kwargs):
+        self._ops.append(("update", ref._path, fields, None))
+
+    def delete(self, ref: FakeDocumentRef, option=None, **kwargs):
+        self._ops.append(("delete", ref._path, None, option))
+
+    def commit(self):
+        self._db.rpc()
+        with self._db.lock:
+            # Atomic: check every precondition before applying anything
+            for op, path, _, option in self._ops:
+                if (op == "update" or option is not None) and path not in self._db.docs:
+                    raise NotFound(f"No document to {op}: {'/'.join(path)}")
+            for op, path, data, _ in self._ops:
+                if op == "set":
+                    self._db.docs[path] = data
+                elif op == "merge":
+                    self._db.docs.setdefault(path, {}).update(data)
+                elif op == "update":
+                    self._db.docs[path].update(data)
+                else:
+                    self._db.docs.pop(path, None)
+
+
+class FakeFirestore:
+    """Dict-backed store keyed by document path tuples."""
+
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.docs: dict[tuple, dict] = {}
+        self.lock = threading.Lock()
+        self.rpcs = 0
+
+    def rpc(self) -> None:
+        self.rpcs += 1
+        _sleep(self.config.firestore_ms, self.config.jitter)
+
+    def read(self, path: tuple) -> dict | None:
+        with self.lock:
+            data = self.docs.get(path)
+            return dict(data) if data is not None else None
+
+    def write(self, path: tuple, data: dict) -> None:
+        with self.lock:
+            self.docs[path] = data
+
+    def update(self, path: tuple, fields: dict) -> None:
+        with self.lock:
+            if path not in self.docs:
+                raise NotFound(f"No document to update: {'/'.join(path)}")
+            self.docs[path].update(fields)
+
+    def delete(self, path: tuple, must_exist: bool) -> None:
+        with self.lock:
+            if path not in self.docs and must_exist:
+                raise NotFound(f"No document to delete: {'/'.join(path)}")
+            self.docs.pop(path, None)
+
+    def list(self, collection_path: tuple) -> list[tuple[str, dict]]:
+        depth = len(collection_path) + 1
+        with self.lock:
+            return [
+                (path[-1], dict(data)) for path, data in self.docs.items()
+                if len(path) == depth and path[:-1] == collection_path
+            ]
+
+    # Client surface
+    def collection(self, name: str) -> FakeQuery:
+        return FakeQuery(self, (name,))
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def get_all(self, refs: list, **kwargs):
+        self.rpc()
+        return iter([FakeSnapshot(ref, self.read(ref._path)) for ref in refs])
+
+    def write_option(self, exists: bool = None, **kwargs):
+        return SimpleNamespace(exists=exists)
+
+
+def seed_tasks(db: FakeFirestore, config: FakeConfig, rng: random.Random) -> None:
+    for u in range(config.users):
+        for t in range(config.tasks_per_user):
+            path = ("users", user_email(u), "tasks", f"task-{u}-{t}")
+            db.docs[path] = {
+                "title": f"Seeded task {t} for project {rng.randint(1, 500)}",
+                "description": "Follow up on the pending items from the last review.",
+                "date": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "priority": rng.choice(["high", "medium", "low"]),
+                "category": rng.choice(["Meeting", "Deadline", "Follow-up", "Action Item", "General"]),
+                "status": rng.choice(["pending", "pending", "completed"]),
+                "createdAt": "2026-10-01T09:00:00",
+            }
+
+
+# ─── Groq ────────────────────────────────────────────────────────────────────
+
+class FakeGroq:
+    """chat.completions.create() stub returning a small task list or a chat reply."""
+
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.calls = 0
+
+    def _create(self, model=None, messages=None, temperature=None, max_tokens=None, **kwargs):
+        self.calls += 1
+        _sleep(self.config.groq_ms, self.config.jitter)
+        prompt_chars = sum(len(m.get("content", "")) for m in messages or [])
+        if "JSON" in (messages[0].get("content", "") if messages else ""):
+            n = random.randint(0, 3)
+            content = json.dumps([
+                {
+                    "title": f"Follow up on email item {random.randint(1, 10_000)}",
+                    "description": "Complete the requested action.",
+                    "date": "2026-11-15",
+                    "priority": random.choice(["high", "medium", "low"]),
+                    "category": "Action Item",
+                }
+                for _ in range(n)
+            ])
+        else:
+            content = "You have a few tasks coming up — start with the high-priority ones. ✅"
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_chars // 4, completion_tokens=len(content) // 4),
+        )
+
+
+# ─── Installation ────────────────────────────────────────────────────────────
+
+def user_email(n: int) -> str:
+    return f"user{n}@bench.local"
+
+
+def bearer_token(n: int) -> str:
+    return f"bench-user-{n}"
+
+
+def _verify_token(id_token: str) -> dict | None:
+    if not id_token.startswith("bench-user-"):
+        return None
+    n = int(id_token.rsplit("-", 1)[1])
+    return {"uid": f"uid-{n}", "email": user_email(n), "name": f"Bench User {n}", "picture": ""}
+
+
+def install_fakes(config: FakeConfig = None) -> dict:
+    """Patch the backend modules to use the fakes. Returns the fake instances."""
+    import auth
+    import ai_engine
+    import google_api
+    import firebase_config
+
+    config = config or FakeConfig()
+    rng = random.Random(config.seed)
+    random.seed(config.seed)
+
+    mailbox = [make_message(f"msg-{i:05d}", rng, config.body_bytes) for i in range(config.emails_per_inbox)]
+    calendars, events = make_calendar(config, rng)
+    db = FakeFirestore(config)
+    seed_tasks(db, config, rng)
+    groq = FakeGroq(config)
+
+    def build_service(service_name, version, credentials=None, **kwargs):
+        if service_name == "gmail":
+            return FakeGmailService(config, mailbox)
+        return FakeCalendarService(config, calendars, events)
+
+    google_api.build_service = build_service
+    firebase_config.db = db
+    firebase_config._initialized = True
+    firebase_config.is_configured = lambda: True
+    ai_engine.client = groq
+    auth.verify_firebase_token = _verify_token
+
+    return {"firestore": db, "groq": groq, "mailbox": mailbox}
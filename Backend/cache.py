@@ -0,0 +1,390 @@
+"""
+Pluggable cache shared by the backend modules (verified tokens, fetched emails,
+calendar windows, task lists, salient text).
+
+    CACHE_BACKEND=memory   per-process LRU (default)
+    CACHE_BACKEND=sqlite   one SQLite file in WAL mode at CACHE_PATH, shared by
+                           every uvicorn worker on the host; no external service
+
+Both backends store serialized values, so callers always get their own copy,
+and both evict least-recently-used entries once CACHE_MAX_BYTES is exceeded.
+The memory backend pickles; the SQLite file holds JSON (tuples come back as
+lists, datetimes as ISO strings), so a tampered file can corrupt values but
+never run code. The file holds token verifications, email text and task lists:
+it defaults to a directory only the app's user can use, and is refused when it
+is not owned by the current user or is accessible to anyone else.
+get_or_compute() is atomic: concurrent callers for a missing key — threads in
+a process, and with SQLite processes on the host (via a lease row) — wait for
+a single computation instead of all hitting the upstream.
+"""
+import os
+import json
+import stat
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from log_config import get_logger
+from metrics import record_cache
+
+logger = get_logger("cache")
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+
+
+def _default_cache_path() -> str:
+    # The per-user runtime directory (mode 0700) when there is one, else next to the app
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "digitwin-cache.sqlite3")
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache.sqlite3")
+
+
+CACHE_PATH = os.getenv("CACHE_PATH") or _default_cache_path()
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LEASE_SECONDS = float(os.getenv("CACHE_LEASE_SECONDS", "30"))
+
+_MISSING = object()
+
+
+def fingerprint(secret: str) -> str:
+    """Stable, non-reversible cache key component for tokens and other secrets."""
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()[:32]
+
+
+def _json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _check_private(path: str) -> None:
+    """Refuse a file another user owns or could read or write (symlinks included)."""
+    if not hasattr(os, "getuid"):
+        return
+    for candidate in (path, f"{path}-wal", f"{path}-shm"):
+        try:
+            st = os.lstat(candidate)
+        except FileNotFoundError:
+            continue
+        if not stat.S_ISREG(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+            raise PermissionError(
+                f"Refusing cache file {candidate}: it must be a regular file owned by uid {os.getuid()} "
+                f"with no group/other access (found uid {st.st_uid}, mode {stat.filemode(st.st_mode)})"
+            )
+
+
+def _key_str(key) -> str:
+    return "\x1f".join(map(str, key)) if isinstance(key, tuple) else str(key)
+
+
+def _namespace(key) -> str:
+    return str(key[0]) if isinstance(key, tuple) else "cache"
+
+
+class _KeyLocks:
+    """One lock per key while anyone holds or waits for it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks: dict = {}
+
+    @contextmanager
+    def hold(self, key):
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+
+class _BaseCache:
+    def __init__(self):
+        self._key_locks = _KeyLocks()
+
+    def get(self, key, default=None):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def _compute_exclusive(self, key, compute, ttl):
+        value = compute()
+        seconds = ttl(value) if callable(ttl) else ttl
+        if seconds > 0:
+            self.set(key, value, seconds)
+        return value
+
+    def get_or_compute(self, key, compute, ttl):
+        """
+        Return the cached value for key, or compute(), store it for `ttl` seconds
+        and return it. Only one caller computes a given key at a time; if
+        compute() raises nothing is stored. ttl may be a function of the computed
+        value (e.g. a token's remaining lifetime); ttl <= 0 means don't store.
+        """
+        if not callable(ttl) and ttl <= 0:
+            return compute()
+        namespace = _namespace(key)
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            record_cache(namespace, hit=True)
+            return value
+
+        with self._key_locks.hold(_key_str(key)):
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                record_cache(namespace, hit=True)
+                return value
+            record_cache(namespace, hit=False)
+            return self._compute_exclusive(key, compute, ttl)
+
+
+class MemoryCache(_BaseCache):
+    """Per-process LRU bounded by total pickled size."""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (expires_at, blob)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        k = _key_str(key)
+        with self._lock:
+            entry = self._entries.get(k)
+            if entry is None:
+                return default
+            if entry[0] < time.time():
+                self._bytes -= len(entry[1])
+                del self._entries[k]
+                return default
+            self._entries.move_to_end(k)
+            blob = entry[1]
+        return pickle.loads(blob)
+
+    def set(self, key, value, ttl: float) -> None:
+        k = _key_str(key)
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            old = self._entries.pop(k, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[k] = (time.time() + ttl, blob)
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            old = self._entries.pop(_key_str(key), None)
+            if old is not None:
+                self._bytes -= len(old[1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class SQLiteCache(_BaseCache):
+    """
+    Host-wide cache in one SQLite database (WAL mode: readers never block the
+    writer). Each thread gets its own connection. Eviction runs every
+    PURGE_EVERY writes: expired rows first, then least-recently-used rows
+    beyond max_bytes. SQLite errors degrade to cache misses, and values that
+    are not JSON-serializable are simply not stored. The file is created 0600
+    (SQLite gives its -wal/-shm files the same mode).
+    """
+
+    PURGE_EVERY = 64
+    TOUCH_AFTER = 5.0   # seconds; limits last-access updates to one write per key per interval
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+        CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at);
+        CREATE TABLE IF NOT EXISTS leases (
+            key TEXT PRIMARY KEY,
+            expires_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_NOFOLLOW", 0), 0o600))
+        except FileExistsError:
+            pass
+        _check_private(path)
+        with self._connection() as conn:
+            conn.executescript(self._SCHEMA)
+
+    @contextmanager
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        yield conn
+
+    def get(self, key, default=None):
+        k, now = _key_str(key), time.time()
+        try:
+            with self._connection() as conn:
+                row = conn.execute(
+                    "SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (k,)
+                ).fetchone()
+                if row is None or row[1] < now:
+                    return default
+                if now - row[2] > self.TOUCH_AFTER:
+                    conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, k))
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"⚠️ Cache read failed: {e}")
+            return default
+
+    def set(self, key, value, ttl: float) -> None:
+        try:
+            blob = json.dumps(value, default=_json_default, separators=(",", ":")).encode("utf-8")
+        except (TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Not caching {_namespace(key)}: {e}")
+            return
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (_key_str(key), blob, len(blob), now + ttl, now),
+                )
+            with self._writes_lock:
+                self._writes += 1
+                purge = self._writes % self.PURGE_EVERY == 0
+            if purge:
+                self.purge()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Cache write failed: {e}")
+
+    def delete(self, key) -> None:
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM entries WHERE key = ?", (_key_str(key),))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Cache delete failed: {e}")
+
+    def clear(self) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM leases")
+
+    def purge(self) -> None:
+        """Drop expired entries, then the least recently used ones beyond max_bytes."""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM entries WHERE expires_at < ?", (time.time(),))
+            conn.execute(
+                """DELETE FROM entries WHERE key IN (
+                       SELECT key FROM (
+                           SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running
+                           FROM entries
+                       ) WHERE running > ?
+                   )""",
+                (self.max_bytes,),
+            )
+
+    def _try_lease(self, k: str) -> bool:
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM leases WHERE key = ? AND expires_at < ?", (k, now))
+                acquired = conn.execute(
+                    "INSERT OR IGNORE INTO leases (key, expires_at) VALUES (?, ?)", (k, now + LEASE_SECONDS)
+                ).rowcount == 1
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return acquired
+
+    def _release_lease(self, k: str) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ?", (k,))
+
+    def _compute_exclusive(self, key, compute, ttl):
+        # Another worker may already be computing this key: wait for its result
+        # (up to the lease duration) rather than computing it again
+        k = _key_str(key)
+        deadline, delay = time.time() + LEASE_SECONDS, 0.01
+        while True:
+            try:
+                leased = self._try_lease(k)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Cache lease failed: {e}")
+                return super()._compute_exclusive(key, compute, ttl)
+            if leased:
+                try:
+                    value = self.get(key, _MISSING)
+                    if value is _MISSING:
+                        value = super()._compute_exclusive(key, compute, ttl)
+                    return value
+                finally:
+                    try:
+                        self._release_lease(k)
+                    except sqlite3.Error:
+                        pass   # expires on its own
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            if time.time() > deadline:
+                return super()._compute_exclusive(key, compute, ttl)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> _BaseCache:
+    """The process-wide cache, created on first use from CACHE_BACKEND."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if CACHE_BACKEND == "sqlite":
+                    _cache = SQLiteCache()
+                    logger.info(f"🗄️ Shared SQLite cache at {CACHE_PATH}")
+                else:
+                    _cache = MemoryCache()
+    return _cache
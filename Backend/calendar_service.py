@@ -1,21 +1,30 @@
-from googleapiclient.discovery import build
+import os
+import google_api
+import single_flight
+from cache import get_cache, fingerprint
 from datetime import datetime, timedelta
-import traceback
+from log_config import get_logger
+from metrics import observe_upstream
 
+logger = get_logger("calendar")
 
-def log_debug(msg):
-    import datetime as dt
-    with open("backend_debug.log", "a", encoding="utf-8") as f:
-        f.write(f"[{dt.datetime.now()}] [CALENDAR] {msg}\n")
+# Month windows are reused for this long (per Google token and window)
+CALENDAR_CACHE_TTL = int(os.getenv("CALENDAR_CACHE_TTL", "120"))
 
 
-def fetch_events(credentials, time_min: str = None, time_max: str = None, max_results: int = 50) -> list[dict]:
+def fetch_events(credentials, time_min: str = None, time_max: str = None, max_results: int = 50, loader=None) -> list[dict]:
     """
     Fetch calendar events from Google Calendar using the user's OAuth credentials.
     time_min and time_max should be ISO 8601 strings (e.g., '2026-02-01T00:00:00Z').
     Returns a list of event dicts: {id, title, start, end, description, location, color}
+    With a RequestLoader each window is fetched at most once per request.
+    Windows are cached per Google token for CALENDAR_CACHE_TTL seconds (see cache.py).
     """
-    service = build("calendar", "v3", credentials=credentials)
+    if loader is not None:
+        return loader.load(
+            ("events", time_min, time_max, max_results),
+            lambda: fetch_events(credentials, time_min, time_max, max_results),
+        )
 
     # Default: current month
     if not time_min:
@@ -29,13 +38,34 @@ def fetch_events(credentials, time_min: str = None, time_max: str = None, max_re
         else:
             time_max = now.replace(month=now.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0).isoformat() + "Z"
 
+    token = getattr(credentials, "token", None)
+    if not token:
+        return _fetch_events(credentials, time_min, time_max, max_results) or []
+
+    # A failed fetch (None) is not cached. Concurrent identical calls share one
+    # fetch (see single_flight) even when nothing is cached for them to wait on.
+    key = ("calendar_events", fingerprint(token), time_min, time_max, max_results)
+    events = single_flight.do(key, lambda: get_cache().get_or_compute(
+        key,
+        lambda: _fetch_events(credentials, time_min, time_max, max_results),
+        ttl=lambda result: CALENDAR_CACHE_TTL if result is not None else 0,
+    ))
+    return events if events is not None else []
+
+
+def _fetch_events(credentials, time_min: str, time_max: str, max_results: int) -> list[dict] | None:
+    """Uncached fetch across all of the user's calendars; returns None if listing them failed."""
+    service = google_api.build_service("calendar", "v3", credentials=credentials)
+
     try:
-        log_debug(f"🔍 Fetching events from ALL calendars (min={time_min}, max={time_max})...")
+        logger.debug(f"🔍 Fetching events from ALL calendars (min={time_min}, max={time_max})...")
 
         # 1. List all calendars (primary, holidays, etc.)
-        calendar_list_result = service.calendarList().list().execute()
+        with observe_upstream("calendar.calendarList"):
+            calendar_list_result = service.calendarList().list().execute()
         calendars = calendar_list_result.get("items", [])
-        log_debug(f"found {len(calendars)} calendars: {[c.get('summary') for c in calendars]}")
+        logger.debug(f"found {len(calendars)} calendars: {[c.get('summary') for c in calendars]}",
+                     extra={"upstream": "calendar.calendarList", "count": len(calendars)})
 
         all_events = []
 
@@ -48,17 +78,18 @@ def fetch_events(credentials, time_min: str = None, time_max: str = None, max_re
             # Skip contact birthdays if desired, or keep them. Often they clutter.
             # if "contacts" in cal_id: continue 
 
-            log_debug(f"  Fetching from: {cal_summary} ({cal_id})")
+            logger.debug(f"  Fetching from: {cal_summary} ({cal_id})")
             
             try:
-                events_result = service.events().list(
-                    calendarId=cal_id,
-                    timeMin=time_min,
-                    timeMax=time_max,
-                    maxResults=max_results,
-                    singleEvents=True,
-                    orderBy="startTime",
-                ).execute()
+                with observe_upstream("calendar.events"):
+                    events_result = service.events().list(
+                        calendarId=cal_id,
+                        timeMin=time_min,
+                        timeMax=time_max,
+                        maxResults=max_results,
+                        singleEvents=True,
+                        orderBy="startTime",
+                    ).execute()
 
                 items = events_result.get("items", [])
                 
@@ -79,13 +110,16 @@ def fetch_events(credentials, time_min: str = None, time_max: str = None, max_re
                         "all_day": "date" in start and "dateTime" not in start,
                         "color": color_id,
                         "source_calendar": cal_summary, # Useful for UI
-                        "is_primary": is_primary
+                        "calendar_id": cal_id,
+                        "is_primary": is_primary,
+                        # "transparent" events (holidays, birthdays, "free" entries) do not block time
+                        "transparency": item.get("transparency", "opaque"),
                     })
             except Exception as e:
-                log_debug(f"  Failed to fetch from {cal_summary}: {e}")
+                logger.warning(f"  Failed to fetch from {cal_summary}: {e}", extra={"upstream": "calendar.events"})
                 continue
 
-        log_debug(f"📅 Total events found: {len(all_events)}")
+        logger.debug(f"📅 Total events found: {len(all_events)}", extra={"count": len(all_events)})
         
         # 3. Sort by start time
         all_events.sort(key=lambda x: x["start"])
@@ -93,6 +127,5 @@ def fetch_events(credentials, time_min: str = None, time_max: str = None, max_re
         return all_events
 
     except Exception as e:
-        log_debug(f"❌ Calendar API failed: {e}")
-        traceback.print_exc()
-        return []
+        logger.exception(f"❌ Calendar API failed: {e}", extra={"upstream": "calendar"})
+        return None
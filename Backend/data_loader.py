@@ -0,0 +1,79 @@
+"""
+Request-scoped data loader (unit of work).
+One RequestLoader lives for the duration of a single API request. Upstream reads
+(Firestore task lists, Gmail messages, Calendar events) are memoized by key so a
+multi-step pipeline reads each resource at most once, and task writes are queued
+and flushed to the task store in batched commits (followed by their after-commit hooks).
+"""
+import threading
+from firebase_config import BATCH_LIMIT
+from metrics import record_cache
+from task_store import get_store
+
+
+class RequestLoader:
+    def __init__(self, user_email: str = None):
+        self.user_email = user_email
+        self._memo: dict = {}
+        self._key_locks: dict = {}
+        self._lock = threading.Lock()
+        self._writes: list = []
+        self._after_commit: list = []
+
+    def load(self, key: tuple, fetch):
+        """Return the memoized value for key, calling fetch() on first use only."""
+        with self._lock:
+            if key in self._memo:
+                record_cache("request_loader", hit=True)
+                return self._memo[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Concurrent callers for the same key wait for the first fetch
+        with key_lock:
+            with self._lock:
+                if key in self._memo:
+                    record_cache("request_loader", hit=True)
+                    return self._memo[key]
+            record_cache("request_loader", hit=False)
+            value = fetch()
+            with self._lock:
+                self._memo[key] = value
+            return value
+
+    def peek(self, key: tuple):
+        """Return the memoized value for key without fetching, or None."""
+        with self._lock:
+            return self._memo.get(key)
+
+    def defer(self, write) -> None:
+        """Queue write(batch) to run at commit time."""
+        with self._lock:
+            self._writes.append(write)
+
+    def after_commit(self, fn) -> None:
+        """Queue fn() to run once the pending writes have been committed."""
+        with self._lock:
+            self._after_commit.append(fn)
+
+    def commit(self) -> int:
+        """Flush queued writes in batched commits, then run after-commit hooks. Returns the number of writes."""
+        with self._lock:
+            writes, self._writes = self._writes, []
+            hooks, self._after_commit = self._after_commit, []
+
+        for i in range(0, len(writes), BATCH_LIMIT):
+            batch = get_store().batch()
+            for write in writes[i:i + BATCH_LIMIT]:
+                write(batch)
+            batch.commit()
+        for fn in hooks:
+            fn()
+        return len(writes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        return False
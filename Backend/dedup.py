@@ -0,0 +1,133 @@
+"""
+Near-duplicate task detection.
+Only tasks that could be the same task are compared at all: they must share a
+title word, carry exactly the same numbers in the title ("assignment 1" is not
+"assignment 2", invoice #1023 is not #1024) and be due the same day unless one
+of them has no date. Such a candidate is a duplicate when its normalized title
+is equal, or when the texts are similar enough as sets of character shingles
+(Jaccard): title + description when both carry a description, else titles.
+Descriptions are free text — the model rewords them, adds dates and times —
+so an equal title is a duplicate whatever the descriptions say. Shingles are computed lazily for
+the few candidates, so checking a handful of new tasks against a long task
+list stays cheap.
+"""
+import re
+
+SHINGLE_SIZE = 4
+
+# "Submit DBMS assignment" vs "Submit DBMS assignment soon" → 0.81
+# "Submit DBMS assignment" vs "Submit OS assignment"      → 0.6
+THRESHOLD = 0.7
+
+# Filler words that do not change what a task is about
+STOP_WORDS = {
+    "a", "an", "the", "to", "for", "of", "on", "in", "at", "by", "my", "your",
+    "our", "and", "or", "with", "please", "kindly",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and filler words."""
+    words = _WORD_RE.findall((text or "").lower())
+    kept = [w for w in words if w not in STOP_WORDS]
+    return " ".join(kept or words)
+
+
+def shingles(text: str) -> set[str]:
+    """Character shingles of the normalized text (padded so short words still count)."""
+    norm = normalize(text)
+    if not norm:
+        return set()
+    padded = f" {norm} "
+    if len(padded) <= SHINGLE_SIZE:
+        return {padded}
+    return {padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _text(task: dict) -> str:
+    return f"{task.get('title', '')} {task.get('description') or ''}"
+
+
+def _numbers(text: str) -> tuple[int, ...]:
+    # "#01" and "1" are the same number
+    return tuple(sorted(int(n) for n in _NUMBER_RE.findall(text)))
+
+
+def _day(task: dict) -> str:
+    return str(task.get("date") or "")[:10]
+
+
+class _Entry:
+    __slots__ = ("task", "title", "numbers", "day", "has_description", "_shingles")
+
+    def __init__(self, task: dict, title: str):
+        self.task = task
+        self.title = title
+        self.numbers = _numbers(title)
+        self.day = _day(task)
+        self.has_description = bool((task.get("description") or "").strip())
+        self._shingles = {}
+
+    def shingles(self, with_description: bool) -> set[str]:
+        if with_description not in self._shingles:
+            text = _text(self.task) if with_description else self.task.get("title", "")
+            self._shingles[with_description] = shingles(text)
+        return self._shingles[with_description]
+
+
+class NearDuplicateIndex:
+    """Word index over one user's tasks; candidates are confirmed with shingle Jaccard."""
+
+    def __init__(self, tasks: list[dict] = None):
+        self._entries: list[_Entry] = []
+        self._by_word: dict[str, list[int]] = {}
+        for task in tasks or []:
+            self.add(task)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, task: dict) -> None:
+        """Index a task so later lookups can match against it."""
+        title = normalize(task.get("title", ""))
+        words = set(title.split())
+        if not words:
+            return
+        idx = len(self._entries)
+        self._entries.append(_Entry(task, title))
+        for word in words:
+            self._by_word.setdefault(word, []).append(idx)
+
+    def find_duplicate(self, task: dict) -> dict | None:
+        """Return the indexed task this one duplicates, or None."""
+        title = normalize(task.get("title", ""))
+        words = set(title.split())
+        if not words:
+            return None
+        probe = _Entry(task, title)
+
+        candidates = set()
+        for word in words:
+            candidates.update(self._by_word.get(word, ()))
+
+        for idx in sorted(candidates):
+            existing = self._entries[idx]
+            if existing.numbers != probe.numbers:
+                continue
+            if existing.day and probe.day and existing.day != probe.day:
+                continue
+            if existing.title == probe.title:
+                return existing.task
+            both = probe.has_description and existing.has_description
+            if jaccard(probe.shingles(both), existing.shingles(both)) >= THRESHOLD:
+                return existing.task
+        return None
@@ -1,51 +1,90 @@
 import os
-import firebase_admin
-from firebase_admin import credentials, firestore
+import threading
 from dotenv import load_dotenv
+from log_config import get_logger
 
 load_dotenv()
 
-# Initialize Firebase Admin SDK
+logger = get_logger("firebase")
+
+# Firebase Admin SDK is initialized lazily on first use (or by the warm-up task),
+# so importing this module does not pull in firebase_admin / Firestore.
 # Priority 1: FIREBASE_CREDENTIALS env var (JSON string)
 # Priority 2: FIREBASE_KEY_PATH file path (default: firebase-key.json)
 
 firebase_creds_json = os.getenv("FIREBASE_CREDENTIALS")
 _firebase_key_path = os.getenv("FIREBASE_KEY_PATH", "firebase-key.json")
 db = None
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def is_configured() -> bool:
+    """True if a Firebase key is provided (FIREBASE_CREDENTIALS or the key file)."""
+    return bool(firebase_creds_json) or os.path.exists(_firebase_key_path)
+
+
+def init_firebase() -> bool:
+    """
+    Initialize the Firebase app and Firestore client once. Returns True if Firestore is available.
+    A failed initialization with a key configured is retried on the next call.
+    """
+    global db, _initialized
+    if _initialized:
+        return db is not None
+
+    with _init_lock:
+        if _initialized:
+            return db is not None
+        try:
+            import firebase_admin
+            from firebase_admin import credentials, firestore
 
-try:
-    if not firebase_admin._apps:
-        cred = None
-        
-        if firebase_creds_json:
-            # Load from JSON string (Release/Cloud environment)
-            import json
-            cred_dict = json.loads(firebase_creds_json)
-            cred = credentials.Certificate(cred_dict)
-            print("✅ Firebase initialized from FIREBASE_CREDENTIALS env var")
-        elif os.path.exists(_firebase_key_path):
-            # Load from file (Local environment)
-            cred = credentials.Certificate(_firebase_key_path)
-            print(f"✅ Firebase initialized from file: {_firebase_key_path}")
-        else:
-            print(f"⚠️  Firebase key not found (Env: FIREBASE_CREDENTIALS or File: {_firebase_key_path}) — Firestore disabled")
-
-        if cred:
-            firebase_admin.initialize_app(cred)
-            db = firestore.client()
-            
-except Exception as e:
-    print(f"⚠️  Firebase initialization failed: {e}")
+            if not firebase_admin._apps:
+                cred = None
+
+                if firebase_creds_json:
+                    # Load from JSON string (Release/Cloud environment)
+                    import json
+                    cred_dict = json.loads(firebase_creds_json)
+                    cred = credentials.Certificate(cred_dict)
+                    logger.info("✅ Firebase initialized from FIREBASE_CREDENTIALS env var")
+                elif os.path.exists(_firebase_key_path):
+                    # Load from file (Local environment)
+                    cred = credentials.Certificate(_firebase_key_path)
+                    logger.info(f"✅ Firebase initialized from file: {_firebase_key_path}")
+                else:
+                    logger.warning(f"⚠️  Firebase key not found (Env: FIREBASE_CREDENTIALS or File: {_firebase_key_path}) — Firestore disabled")
+
+                if cred:
+                    firebase_admin.initialize_app(cred)
+
+            if firebase_admin._apps and db is None:
+                db = firestore.client()
+
+            _initialized = True
+        except Exception as e:
+            logger.error(f"⚠️  Firebase initialization failed: {e}")
+            _initialized = not is_configured()
+    return db is not None
 
 
 def _ensure_db():
     """Raise a clear error if Firestore is not available."""
+    if db is None:
+        init_firebase()
     if db is None:
         raise RuntimeError(
             "Firestore is not initialized. Place your firebase-key.json in the backend/ directory."
         )
 
 
+def is_not_found(exc: Exception) -> bool:
+    """True if exc is Firestore's NotFound (imported here lazily; google.api_core pulls in grpc)."""
+    from google.api_core.exceptions import NotFound
+    return isinstance(exc, NotFound)
+
+
 def get_user_tasks_ref(user_email: str):
     """Get reference to a user's tasks collection."""
     _ensure_db()
@@ -62,3 +101,25 @@ def get_user_doc(user_email: str):
     """Get reference to a user document."""
     _ensure_db()
     return db.collection("users").document(user_email)
+
+
+# Firestore caps a single batched commit at 500 writes
+BATCH_LIMIT = 500
+
+
+def get_batch():
+    """Get a Firestore write batch (up to 500 writes committed in one RPC)."""
+    _ensure_db()
+    return db.batch()
+
+
+def get_all_docs(doc_refs: list):
+    """Fetch several documents in a single RPC."""
+    _ensure_db()
+    return db.get_all(doc_refs)
+
+
+def must_exist():
+    """Write precondition that fails the write with NotFound if the document is missing."""
+    _ensure_db()
+    return db.write_option(exists=True)
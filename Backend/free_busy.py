@@ -0,0 +1,192 @@
+"""
+Calendar-aware scheduling checks, done locally.
+A FreeBusyIndex is built from calendar_service.fetch_events() results (timed
+and all-day events, across all calendars): events sorted by start for
+conflict lookups, plus the merged busy intervals for finding free time.
+Tasks only carry a date, so a task conflicts when its day has no free slot of
+at least MIN_FREE_MINUTES inside the working hours; the nearest free slot is
+then suggested.
+
+Only events that block time are indexed: events marked "transparent" (shown
+as free in Google Calendar) and all-day events from calendars other than the
+primary one (holidays, birthdays, subscribed calendars) are ignored.
+
+Times are compared as wall-clock times in each event's own offset, and the
+index only knows about the window that was fetched — days outside it look free.
+"""
+import os
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+
+
+def _parse_clock(value: str) -> time:
+    hours, _, minutes = value.partition(":")
+    return time(int(hours), int(minutes or 0))
+
+
+DAY_START = _parse_clock(os.getenv("SCHEDULE_DAY_START", "09:00"))
+DAY_END = _parse_clock(os.getenv("SCHEDULE_DAY_END", "18:00"))
+MIN_FREE_MINUTES = int(os.getenv("SCHEDULE_MIN_FREE_MINUTES", "60"))
+# How far either side of a blocked day to look for a free slot
+SEARCH_DAYS = int(os.getenv("SCHEDULE_SEARCH_DAYS", "14"))
+# Calendar window the agent fetches for the index, starting today
+HORIZON_DAYS = int(os.getenv("SCHEDULE_HORIZON_DAYS", "45"))
+
+
+def _parse_when(value: str) -> datetime | None:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed.replace(tzinfo=None)
+
+
+def _event_span(event: dict) -> tuple[datetime, datetime] | None:
+    """(start, end) of an event; all-day events cover whole days (end date exclusive)."""
+    start = _parse_when(event.get("start", ""))
+    if start is None:
+        return None
+    end = _parse_when(event.get("end", "")) or start
+    if event.get("all_day") or len(event.get("start", "")) == 10:
+        end = max(end, start + timedelta(days=1))
+    return start, max(end, start)
+
+
+def _blocks_time(event: dict) -> bool:
+    if event.get("transparency") == "transparent":
+        return False
+    all_day = event.get("all_day") or len(event.get("start", "")) == 10
+    # Events without calendar info (older cached windows) count as the user's own
+    return not (all_day and event.get("is_primary") is False)
+
+
+def _parse_day(value) -> date | None:
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _slot(start: datetime, end: datetime) -> dict:
+    return {"date": start.date().isoformat(), "start": start.strftime("%H:%M"), "end": end.strftime("%H:%M")}
+
+
+class FreeBusyIndex:
+    """Sorted free/busy view of one user's calendar window."""
+
+    def __init__(self, events: list[dict]):
+        entries = []
+        for event in events or []:
+            if not _blocks_time(event):
+                continue
+            span = _event_span(event)
+            if span is not None:
+                entries.append((span[0], span[1], event))
+        entries.sort(key=lambda e: (e[0], e[1]))
+        self._entries = entries
+        self._starts = [e[0] for e in entries]
+        # Longest event: bounds how far back an overlapping event can start
+        self._max_length = max((e[1] - e[0] for e in entries), default=timedelta(0))
+
+        busy = []
+        for start, end, _ in entries:
+            if busy and start <= busy[-1][1]:
+                busy[-1][1] = max(busy[-1][1], end)
+            elif end > start:
+                busy.append([start, end])
+        self._busy = busy
+        self._busy_starts = [b[0] for b in busy]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def overlapping(self, start: datetime, end: datetime) -> list[dict]:
+        """Events intersecting [start, end)."""
+        lo = bisect_left(self._starts, start - self._max_length)
+        hi = bisect_left(self._starts, end)
+        return [event for s, e, event in self._entries[lo:hi] if e > start or s == start]
+
+    def free_slots(self, day: date, min_minutes: int = MIN_FREE_MINUTES) -> list[tuple[datetime, datetime]]:
+        """Free gaps of at least min_minutes within the working hours of `day`."""
+        window_start, window_end = datetime.combine(day, DAY_START), datetime.combine(day, DAY_END)
+        minimum = timedelta(minutes=min_minutes)
+        slots, cursor = [], window_start
+        i = max(bisect_right(self._busy_starts, window_start) - 1, 0)
+        while i < len(self._busy) and self._busy[i][0] < window_end:
+            busy_start, busy_end = self._busy[i]
+            if busy_end > cursor:
+                if busy_start - cursor >= minimum:
+                    slots.append((cursor, busy_start))
+                cursor = max(cursor, busy_end)
+            i += 1
+        if window_end - cursor >= minimum:
+            slots.append((cursor, window_end))
+        return slots
+
+    def nearest_free_slot(self, day: date, not_before: date = None, min_minutes: int = MIN_FREE_MINUTES) -> dict | None:
+        """First free slot on `day`, else on the closest day (earlier days win ties), never before not_before."""
+        for offset in range(SEARCH_DAYS + 1):
+            candidates = (day,) if offset == 0 else (day - timedelta(days=offset), day + timedelta(days=offset))
+            for candidate in candidates:
+                if not_before and candidate < not_before:
+                    continue
+                slots = self.free_slots(candidate, min_minutes)
+                if slots:
+                    return _slot(*slots[0])
+        return None
+
+    def check(self, day: date, not_before: date = None) -> dict:
+        """
+        Scheduling report for a task due on `day`:
+        status is "free" (nothing booked in working hours), "busy" (booked but a
+        free slot remains) or "conflict" (no free slot), with the overlapping events
+        and the suggested slot.
+        """
+        window_start, window_end = datetime.combine(day, DAY_START), datetime.combine(day, DAY_END)
+        events = self.overlapping(window_start, window_end)
+        if not events:
+            return {"status": "free", "conflicts": [], "suggested_slot": _slot(window_start, window_end)}
+
+        slots = self.free_slots(day)
+        return {
+            "status": "busy" if slots else "conflict",
+            "conflicts": [
+                {
+                    "id": e.get("id", ""),
+                    "title": e.get("title", ""),
+                    "start": e.get("start", ""),
+                    "end": e.get("end", ""),
+                    "all_day": bool(e.get("all_day")),
+                    "calendar": e.get("source_calendar", ""),
+                }
+                for e in events
+            ],
+            "suggested_slot": _slot(*slots[0]) if slots else self.nearest_free_slot(day, not_before),
+        }
+
+
+def check_tasks(tasks: list[dict], index: FreeBusyIndex, today: date = None) -> list[dict]:
+    """
+    Check each task's date against the index and store the result on the task
+    (task["schedule"]), so it is saved with it; suggested slots never fall
+    before today. Returns schedule_report(tasks).
+    """
+    today = today or date.today()
+    for task in tasks:
+        day = _parse_day(task.get("date"))
+        if day is not None:
+            task["schedule"] = index.check(day, not_before=today)
+    return schedule_report(tasks)
+
+
+def schedule_report(tasks: list[dict]) -> list[dict]:
+    """One entry per task checked by check_tasks()."""
+    return [
+        {"task_id": task.get("id"), "title": task.get("title", ""), "date": str(task["date"])[:10], **task["schedule"]}
+        for task in tasks
+        if task.get("schedule")
+    ]
@@ -1,104 +1,339 @@
+import os
+import re
+import html
 import base64
-from googleapiclient.discovery import build
-import traceback
-import datetime
+import google_api
+import single_flight
+from concurrent.futures import ThreadPoolExecutor
+from cache import get_cache, fingerprint
+from log_config import get_logger
+from metrics import observe_upstream
+from tracing import span
 
-def log_debug(msg):
-    with open("backend_debug.log", "a", encoding="utf-8") as f:
-        f.write(f"[{datetime.datetime.now()}] {msg}\n")
+logger = get_logger("gmail")
 
+# Per-message caps on decoded body bytes (0 disables a cap)
+MAX_TEXT_BYTES = int(os.getenv("GMAIL_MAX_TEXT_BYTES", str(64 * 1024)))
+MAX_HTML_BYTES = int(os.getenv("GMAIL_MAX_HTML_BYTES", str(256 * 1024)))
+TRUNCATION_MARKER = "\n[… truncated: showing {shown} of {total} bytes]"
 
+# Salient text: the readable part of a message, bounded for the LLM prompt
+SALIENT_MAX_CHARS = int(os.getenv("SALIENT_MAX_CHARS", "800"))
+SALIENT_CACHE_TTL = int(os.getenv("SALIENT_CACHE_TTL", str(24 * 3600)))
 
-def fetch_emails(credentials, max_results: int = 20) -> list[dict]:
+# Inbox listings are reused for this long (per Google token, page size and query)
+EMAIL_CACHE_TTL = int(os.getenv("EMAIL_CACHE_TTL", "60"))
+
+# Search pushdown: keyword queries are split so none exceeds this many characters
+QUERY_MAX_CHARS = int(os.getenv("GMAIL_QUERY_MAX_CHARS", "1024"))
+
+
+def _search_term(keyword: str) -> str:
+    keyword = keyword.replace('"', "").strip()
+    return f'"{keyword}"' if " " in keyword or "-" in keyword or "'" in keyword else keyword
+
+
+def build_search_queries(keywords: list[str], newer_than_days: int = None, max_chars: int = QUERY_MAX_CHARS) -> list[str]:
+    """
+    Gmail search expressions matching any of the keywords, e.g.
+    'newer_than:14d {invoice "payment due" ...}'. Keywords are split across as
+    many queries as needed to keep each under max_chars; run them all and merge.
+    """
+    prefix = f"newer_than:{newer_than_days}d " if newer_than_days else ""
+    queries, terms, length = [], [], len(prefix) + 2
+    for term in dict.fromkeys(_search_term(k) for k in keywords if k.strip()):
+        if terms and length + len(term) + 1 > max_chars:
+            queries.append(prefix + "{" + " ".join(terms) + "}")
+            terms, length = [], len(prefix) + 2
+        terms.append(term)
+        length += len(term) + 1
+    if terms:
+        queries.append(prefix + "{" + " ".join(terms) + "}")
+    return queries
+
+
+def fetch_emails(credentials, max_results: int = 20, loader=None, on_email=None, queries: list[str] = None) -> list[dict]:
     """
     Fetch recent emails from Gmail using the user's OAuth credentials.
-    Returns a list of email dicts: {id, sender, subject, snippet, body, date}
+    Returns a list of email dicts: {id, sender, subject, snippet, body, body_html, salient_text, date}
+    With `queries` (see build_search_queries) only inbox messages matching one of
+    them are listed and downloaded: the newest max_results across all queries.
+    With a RequestLoader the fetch happens at most once per request.
+    on_email(email) is called as each message arrives so callers can start work early.
+    Listings are cached per Google token for EMAIL_CACHE_TTL seconds (see cache.py).
     """
-    service = build("gmail", "v1", credentials=credentials)
+    queries = tuple(queries or ())
+    if loader is not None:
+        return loader.load(
+            ("emails", max_results, queries),
+            lambda: fetch_emails(credentials, max_results, on_email=on_email, queries=queries),
+        )
 
-    # Get message list
+    token = getattr(credentials, "token", None)
+    if not token:
+        return _fetch_emails(credentials, max_results, on_email, queries) or []
+
+    fetched = False
+    key = ("emails", fingerprint(token), max_results, *queries)
+
+    def fetch():
+        nonlocal fetched
+        fetched = True
+        return _fetch_emails(credentials, max_results, on_email, queries)
+
+    # A failed listing (None) is not cached. Concurrent identical calls share one
+    # fetch (see single_flight) even when nothing is cached for them to wait on.
+    emails = single_flight.do(key, lambda: get_cache().get_or_compute(
+        key,
+        fetch,
+        ttl=lambda result: EMAIL_CACHE_TTL if result is not None else 0,
+    ))
+    if emails is None:
+        return []
+    if on_email and not fetched:
+        for email in emails:
+            on_email(email)
+    return emails
+
+
+def _list_page(service, max_results: int, q: str | None) -> list[dict] | None:
     try:
-        log_debug(f"🔍 Fetching emails (max={max_results})...")
-
-        results = service.users().messages().list(
-            userId="me",
-            maxResults=max_results,
-            labelIds=["INBOX"],
-        ).execute()
-
-        messages = results.get("messages", [])
-        log_debug(f"📧 Gmail API found {len(messages)} messages")
-        
-        if not messages:
-            log_debug("⚠️ Gmail API returned NO messages")
-            return []
+        with observe_upstream("gmail.list"):
+            results = service.users().messages().list(
+                userId="me",
+                maxResults=max_results,
+                labelIds=["INBOX"],
+                q=q,
+            ).execute()
+        return results.get("messages", [])
     except Exception as e:
-        log_debug(f"❌ Gmail API list failed: {e}")
-        traceback.print_exc()
+        logger.exception(f"❌ Gmail API list failed: {e}", extra={"upstream": "gmail.list"})
+        return None
+
+
+def _list_messages(service, max_results: int, queries: tuple) -> list[dict] | None:
+    """
+    Message ids from the inbox, or from each query (listed concurrently) merged.
+    Gmail ids grow with arrival time, so the merged list is ordered newest first
+    by id. Returns None only if every listing failed.
+    """
+    if len(queries) <= 1:
+        return _list_page(service, max_results, queries[0] if queries else None)
+
+    with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+        pages = list(pool.map(lambda q: _list_page(service, max_results, q), queries))
+    if all(page is None for page in pages):
+        return None
+
+    listed = {}
+    for page in pages:
+        for msg_info in page or []:
+            listed.setdefault(msg_info["id"], msg_info)
+    messages = sorted(listed.values(), key=lambda m: (len(m["id"]), m["id"]), reverse=True)
+    return messages[:max_results]
+
+
+def _fetch_emails(credentials, max_results: int, on_email=None, queries: tuple = ()) -> list[dict] | None:
+    """Uncached fetch; returns None if the message listing itself failed."""
+    service = google_api.build_service("gmail", "v1", credentials=credentials)
+
+    # Get message list
+    logger.debug(f"🔍 Fetching emails (max={max_results}, queries={len(queries)})...")
+    messages = _list_messages(service, max_results, queries)
+    if messages is None:
+        return None
+    logger.debug(f"📧 Gmail API found {len(messages)} messages", extra={"upstream": "gmail.list", "count": len(messages)})
+
+    if not messages:
+        logger.info("⚠️ Gmail API returned NO messages", extra={"upstream": "gmail.list"})
         return []
 
+    # Message ids are only unique within a mailbox
+    token = getattr(credentials, "token", None)
+    owner = fingerprint(token) if token else None
+
     emails = []
     for msg_info in messages:
         try:
-            msg = service.users().messages().get(
-                userId="me",
-                id=msg_info["id"],
-                format="full",
-            ).execute()
+            with observe_upstream("gmail.get"):
+                msg = service.users().messages().get(
+                    userId="me",
+                    id=msg_info["id"],
+                    format="full",
+                ).execute()
 
-            headers = {h["name"]: h["value"] for h in msg.get("payload", {}).get("headers", [])}
+            with span("gmail.parse", id=msg_info["id"]):
+                headers = {h["name"]: h["value"] for h in msg.get("payload", {}).get("headers", [])}
 
-            # Extract both text and html body
-            body_text, body_html = _extract_body(msg.get("payload", {}))
+                # Extract both text and html body
+                body_text, body_html = _extract_body(msg.get("payload", {}))
+                salient = salient_text(msg_info["id"], body_text, body_html, owner=owner)
 
-            emails.append({
+            email = {
                 "id": msg_info["id"],
                 "sender": headers.get("From", "Unknown"),
                 "subject": headers.get("Subject", "(No Subject)"),
                 "snippet": msg.get("snippet", ""),
                 "body": body_text or "",
                 "body_html": body_html or "",
+                "salient_text": salient,
                 "date": headers.get("Date", ""),
-            })
+            }
+            emails.append(email)
+            if on_email:
+                on_email(email)
         except Exception as e:
-            print(f"Error fetching email {msg_info['id']}: {e}")
+            logger.warning(f"Error fetching email {msg_info['id']}: {e}", extra={"upstream": "gmail.get"})
             continue
 
     return emails
 
 
+def _is_attachment(part: dict) -> bool:
+    """Attachment parts are never decoded, even when their type is text/*."""
+    if part.get("filename") or part.get("body", {}).get("attachmentId"):
+        return True
+    for h in part.get("headers", []):
+        if h.get("name", "").lower() == "content-disposition":
+            return h.get("value", "").lower().startswith("attachment")
+    return False
+
+
+def _decode_capped(body: dict, cap: int) -> str:
+    """
+    Decode at most `cap` bytes of a base64url part body.
+    Only the needed prefix of the encoded string is sliced and decoded, so a
+    5 MB newsletter costs `cap` bytes, not the full message.
+    """
+    data = body.get("data", "")
+    total = body.get("size") or len(data) * 3 // 4 - (2 if data.endswith("==") else data.endswith("="))
+    if cap <= 0 or total <= cap:
+        chunk, truncated = data, False
+    else:
+        chunk, truncated = data[:(cap + 2) // 3 * 4], True
+
+    raw = memoryview(base64.urlsafe_b64decode(chunk + "=" * (-len(chunk) % 4)))
+    if truncated:
+        raw = raw[:cap]
+    text = str(raw, "utf-8", errors="replace")
+    if truncated:
+        # A multi-byte character may have been cut in half at the cap
+        text = text.rstrip("\ufffd") + TRUNCATION_MARKER.format(shown=len(raw), total=total)
+    return text
+
+
 def _extract_body(payload: dict) -> tuple[str, str]:
     """Extract both text/plain and text/html body from a Gmail message payload.
-    Returns (body_text, body_html) tuple."""
-    body_text = ""
-    body_html = ""
-    
-    # Simple single-part message
-    mime = payload.get("mimeType", "")
-    data = payload.get("body", {}).get("data", "")
-    
-    if mime == "text/plain" and data:
-        body_text = base64.urlsafe_b64decode(data).decode("utf-8", errors="replace")
-    elif mime == "text/html" and data:
-        body_html = base64.urlsafe_b64decode(data).decode("utf-8", errors="replace")
-
-    # Multipart — look through parts
-    parts = payload.get("parts", [])
-    for part in parts:
-        part_mime = part.get("mimeType", "")
-        part_data = part.get("body", {}).get("data", "")
-        
-        if part_mime == "text/plain" and part_data and not body_text:
-            body_text = base64.urlsafe_b64decode(part_data).decode("utf-8", errors="replace")
-        elif part_mime == "text/html" and part_data and not body_html:
-            body_html = base64.urlsafe_b64decode(part_data).decode("utf-8", errors="replace")
-        
-        # Nested multipart (e.g. multipart/alternative inside multipart/mixed)
-        if part.get("parts"):
-            nested_text, nested_html = _extract_body(part)
-            if nested_text and not body_text:
-                body_text = nested_text
-            if nested_html and not body_html:
-                body_html = nested_html
+    Returns (body_text, body_html) tuple.
 
+    Walks the MIME tree iteratively in document order, taking the first
+    text/plain and text/html parts, skipping attachments and stopping as soon
+    as both are found. Only the two chosen parts are decoded, each capped at
+    MAX_TEXT_BYTES / MAX_HTML_BYTES with a truncation marker."""
+    found = {}
+    stack = [payload]
+    while stack and len(found) < 2:
+        part = stack.pop()
+        mime = part.get("mimeType", "")
+        if mime in ("text/plain", "text/html") and mime not in found:
+            if part.get("body", {}).get("data") and not _is_attachment(part):
+                found[mime] = part["body"]
+        children = part.get("parts")
+        if children:
+            stack.extend(reversed(children))
+
+    body_text = _decode_capped(found["text/plain"], MAX_TEXT_BYTES) if "text/plain" in found else ""
+    body_html = _decode_capped(found["text/html"], MAX_HTML_BYTES) if "text/html" in found else ""
     return body_text, body_html
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SALIENT TEXT — markup, quoted replies, signatures and footers stripped
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_DROP_BLOCKS = re.compile(r"<(script|style|head|title)\b.*?</\1\s*>|<!--.*?-->", re.IGNORECASE | re.DOTALL)
+# Quoted history in HTML replies; everything after it is the previous thread
+_HTML_QUOTE = re.compile(r"<(?:div|blockquote)[^>]*class=[\"'][^\"']*(?:gmail_quote|yahoo_quoted|moz-cite-prefix)|<blockquote\b|<div[^>]*id=[\"']?(?:divRplyFwdMsg|appendonsend)", re.IGNORECASE)
+_BLOCK_TAGS = re.compile(r"<\s*(?:br|/p|/div|/li|/tr|/h[1-6]|/table|hr)\b[^>]*>", re.IGNORECASE)
+_TAGS = re.compile(r"<[^>]+>")
+_SPACES = re.compile(r"[ \t\r\f\v\u00a0\u200b]+")
+
+# Line-level cut points in plain text: reply headers and signature delimiters
+_REPLY_HEADER = re.compile(
+    r"^(?:on .{0,200}wrote:|-{2,}\s*original message\s*-{2,}|_{5,}|sent from my \w+)",
+    re.IGNORECASE,
+)
+# "From: …" starts a forwarded/quoted header block only when header lines follow it
+# (Outlook style) or a separator line precedes it; otherwise it is ordinary text
+_FROM_LINE = re.compile(r"^from:\s", re.IGNORECASE)
+_HEADER_LINE = re.compile(r"^(?:sent|to|cc|date|subject):", re.IGNORECASE)
+_SEPARATOR = re.compile(r"^[-=*_]{3,}$")
+_FOOTER = re.compile(
+    r"unsubscribe|view (?:this email |it )?in (?:your )?browser|privacy policy|all rights reserved|"
+    r"manage (?:your )?(?:preferences|subscription)|you are receiving this|©|copyright \d{4}",
+    re.IGNORECASE,
+)
+
+def html_to_text(body_html: str) -> str:
+    """Readable text from an HTML body: scripts, styles, comments and quoted history removed."""
+    quote = _HTML_QUOTE.search(body_html)
+    if quote:
+        body_html = body_html[:quote.start()]
+    text = _DROP_BLOCKS.sub(" ", body_html)
+    text = _BLOCK_TAGS.sub("\n", text)
+    text = html.unescape(_TAGS.sub(" ", text))
+    return _SPACES.sub(" ", text)
+
+
+def _quote_header_at(lines: list[str], i: int) -> bool:
+    if not _FROM_LINE.match(lines[i]):
+        return False
+    if i and _SEPARATOR.match(lines[i - 1]):
+        return True
+    return any(_HEADER_LINE.match(line) for line in lines[i + 1:i + 3])
+
+
+def _salient_lines(text: str, max_chars: int) -> str:
+    """Keep the message's own lines: stop at quoted replies or a signature, drop footer lines."""
+    lines = []
+    for line in text.splitlines():
+        if line == "-- " or line.strip() == "--":
+            break
+        line = line.strip()
+        if line:
+            lines.append(line)
+
+    out, size = [], 0
+    for i, line in enumerate(lines):
+        if line.startswith(">") or _REPLY_HEADER.match(line) or _quote_header_at(lines, i):
+            break
+        if _SEPARATOR.match(line):
+            continue
+        if _FOOTER.search(line):
+            continue
+        out.append(line)
+        size += len(line) + 1
+        if size >= max_chars:
+            break
+    text = " ".join(out)
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0] + " …"
+    return text
+
+
+def salient_text(message_id: str, body_text: str, body_html: str, max_chars: int = None, owner: str = None) -> str:
+    """
+    Compact, LLM-ready text for one message, at most `max_chars` (SALIENT_MAX_CHARS).
+    Uses the text/plain body when present, otherwise the HTML converted to text.
+    Messages are immutable, so results are cached per mailbox (`owner`, a token
+    fingerprint) and message id (SALIENT_CACHE_TTL); without an owner nothing is cached.
+    """
+    max_chars = max_chars or SALIENT_MAX_CHARS
+
+    def compute():
+        source = body_text if body_text.strip() else html_to_text(body_html) if body_html else ""
+        return _salient_lines(source, max_chars)
+
+    if not owner:
+        return compute()
+    return get_cache().get_or_compute(("salient_text", owner, message_id, max_chars), compute, ttl=SALIENT_CACHE_TTL)
@@ -0,0 +1,111 @@
+"""
+Google API client construction and the shared HTTP transport.
+googleapiclient is imported on first use rather than when the app starts, so
+cold starts don't pay for it until a Gmail or Calendar route is actually hit.
+
+httplib2.Http keeps connections alive but is not safe for concurrent use, and
+build(credentials=...) creates a fresh one per service, i.e. a new TLS handshake
+to googleapis.com on every request. Instead every service shares a pool of Http
+objects: each API call checks one out, sends through it with the user's
+credentials and hands it back, so calls from any thread reuse warm connections.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+POOL_SIZE = int(os.getenv("GOOGLE_HTTP_POOL_SIZE", "16"))
+HTTP_TIMEOUT = float(os.getenv("GOOGLE_HTTP_TIMEOUT", "30"))
+SERVICE_CACHE_SIZE = int(os.getenv("GOOGLE_SERVICE_CACHE_SIZE", "256"))
+
+
+class HttpPool:
+    """Idle httplib2.Http objects, handed out to one caller at a time (LIFO keeps the warmest in use)."""
+
+    def __init__(self, size: int = POOL_SIZE, timeout: float = HTTP_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        import httplib2
+        return httplib2.Http(timeout=self.timeout)
+
+    def release(self, http) -> None:
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(http)
+                return
+        http.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for http in idle:
+            http.close()
+
+
+_pool = HttpPool()
+
+
+class PooledAuthorizedHttp:
+    """
+    The `http` object handed to googleapiclient: signs each request with the
+    user's credentials and sends it over a connection borrowed from the pool.
+    Safe to share between threads.
+    """
+
+    def __init__(self, credentials, pool: HttpPool = _pool):
+        self.credentials = credentials
+        self.pool = pool
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        import google_auth_httplib2
+
+        conn = self.pool.acquire()
+        try:
+            authed = google_auth_httplib2.AuthorizedHttp(self.credentials, http=conn)
+            return authed.request(uri, method, body=body, headers=headers, **kwargs)
+        except Exception:
+            # The connection may be half-read; drop it rather than return it to the pool
+            conn.close()
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                self.pool.release(conn)
+
+    def close(self) -> None:
+        pass
+
+
+_services = OrderedDict()
+_services_lock = threading.Lock()
+
+
+def build_service(service_name: str, version: str, credentials):
+    """
+    Build a Gmail / Calendar API resource for the given user credentials.
+    Resources are cached per (service, version, credentials) — auth caches the
+    credentials per access token — so repeat requests skip discovery parsing.
+    """
+    key = (service_name, version, id(credentials))
+    with _services_lock:
+        entry = _services.get(key)
+        if entry is not None and entry[0] is credentials:
+            _services.move_to_end(key)
+            return entry[1]
+
+    from googleapiclient.discovery import build
+    service = build(service_name, version, http=PooledAuthorizedHttp(credentials), cache_discovery=False)
+
+    with _services_lock:
+        # Holding the credentials keeps id() from being reused while the entry lives
+        _services[key] = (credentials, service)
+        _services.move_to_end(key)
+        while len(_services) > SERVICE_CACHE_SIZE:
+            _services.popitem(last=False)
+    return service
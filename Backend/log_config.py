@@ -0,0 +1,173 @@
+"""
+Structured, non-blocking logging.
+Request handlers only put records on an in-memory queue; a background listener
+thread formats them as JSON lines and writes them to a size-rotated log file and
+to stderr. No file I/O ever happens on the request thread.
+
+Environment:
+    LOG_LEVEL        minimum level (default INFO)
+    LOG_FILE         log file path (default backend_debug.log)
+    LOG_MAX_BYTES    rotate after this many bytes (default 5 MB)
+    LOG_BACKUP_COUNT rotated files to keep (default 3)
+    LOG_SAMPLE_RATE  fraction of DEBUG/INFO records kept, 0.0-1.0 (default 1.0);
+                     WARNING and above are never sampled out
+"""
+import os
+import sys
+import copy
+import json
+import queue
+import random
+import atexit
+import logging
+import threading
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "backend_debug.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "3"))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = 10_000
+
+# Per-request fields (request_id, route, user) attached to every record
+request_context: contextvars.ContextVar[dict] = contextvars.ContextVar("request_context", default={})
+
+# Attributes every LogRecord has; anything else was passed via extra= and is structured data
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_setup_lock = threading.Lock()
+_listener: QueueListener | None = None
+dropped_records = 0
+
+
+def bind_request(**fields) -> contextvars.Token:
+    """Start a request context. Returns a token for reset_request()."""
+    return request_context.set(dict(fields))
+
+
+def reset_request(token: contextvars.Token) -> None:
+    request_context.reset(token)
+
+
+def bind(**fields) -> None:
+    """Add fields (e.g. user) to the current request context."""
+    ctx = request_context.get()
+    if ctx:
+        ctx.update(fields)
+
+
+class _ContextFilter(logging.Filter):
+    """Copy the request context onto the record (runs on the request thread)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in request_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class _SamplingFilter(logging.Filter):
+    """Keep only LOG_SAMPLE_RATE of records below WARNING."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Enqueue without blocking; drop the record if the writer thread is behind."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now, but leave JSON formatting to the listener
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg plus any structured fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Short human-readable line for the terminal."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        extras = " ".join(
+            f"{k}={v}" for k, v in vars(record).items()
+            if k not in _RESERVED and not k.startswith("_")
+        )
+        line = f"[{record.levelname}] {record.name}: {record.getMessage()}"
+        if extras:
+            line += f"  ({extras})"
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def setup_logging() -> None:
+    """Install the queue handler and start the writer thread (idempotent)."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        file_handler = RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+            encoding="utf-8", delay=True,
+        )
+        file_handler.setFormatter(JsonFormatter())
+        console_handler = logging.StreamHandler(sys.stderr)
+        console_handler.setFormatter(ConsoleFormatter())
+
+        log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        queue_handler = _NonBlockingQueueHandler(log_queue)
+        queue_handler.addFilter(_ContextFilter())
+        queue_handler.addFilter(_SamplingFilter(LOG_SAMPLE_RATE))
+
+        root = logging.getLogger("digitwin")
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(queue_handler)
+        root.propagate = False
+
+        _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a backend module, e.g. get_logger("gmail")."""
+    setup_logging()
+    return logging.getLogger(f"digitwin.{name}")
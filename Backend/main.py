@@ -1,8 +1,13 @@
+import time
+_import_started = time.perf_counter()
+
 import os
-import traceback
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
@@ -13,10 +18,38 @@ import gmail_service
 import calendar_service
 import ai_engine
 import task_manager
+import task_events
+import log_config
+import metrics
+import tracing
+import warmup
+import task_store
+import free_busy
+from api_responses import FastJSONResponse, CompressionMiddleware, conditional_json
+from data_loader import RequestLoader
+from log_config import get_logger
+
+logger = get_logger("api")
 
 # ─── App ────────────────────────────────────────────────────────────────────
 
-app = FastAPI(title="DigiTwin Backend", version="3.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm heavy SDKs and clients in the background; set WARMUP=0 to initialize purely on first use."""
+    if os.getenv("WARMUP", "1") != "0":
+        warmup.start_background_warmup()
+    else:
+        warmup.mark_disabled()
+    yield
+    task_store.close_store()
+
+
+app = FastAPI(
+    title="DigiTwin Backend",
+    version="3.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
@@ -33,9 +66,54 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Request-Id", "X-Trace-Id"],
 )
 
 
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    """
+    Per-request observability: binds request_id/route/user to every log record,
+    writes one access record, records the route latency histogram and, for opted-in
+    requests, a timing trace (see tracing.py).
+    """
+    request_id = uuid.uuid4().hex[:12]
+    token = log_config.bind_request(request_id=request_id, route=request.url.path)
+    metrics.REQUESTS_IN_FLIGHT.inc()
+    trace = None
+    if tracing.should_trace(request.headers):
+        profile = tracing.is_authorized(request.headers) and request.headers.get("x-debug-profile") == "1"
+        trace, trace_token = tracing.start_trace(request_id, f"{request.method} {request.url.path}", profile=profile)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-Id"] = request_id
+        if trace is not None:
+            response.headers["X-Trace-Id"] = request_id
+        return response
+    finally:
+        if trace is not None:
+            tracing.finish_trace(trace, trace_token, status=status)
+        elapsed = time.perf_counter() - start
+        metrics.REQUESTS_IN_FLIGHT.dec()
+        # Label by route template (/tasks/{task_id}) so ids don't explode the label set
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        log_config.bind(route=route_path)
+        metrics.REQUEST_LATENCY.observe(elapsed, method=request.method, route=route_path, status=status)
+        logger.info(
+            f"{request.method} {request.url.path} → {status}",
+            extra={"status": status, "duration_ms": round(elapsed * 1000, 1)},
+        )
+        log_config.reset_request(token)
+
+
+# Added last, so it is the outermost layer and compresses the final body
+app.add_middleware(CompressionMiddleware)
+
+
 # ─── Auth Helper ─────────────────────────────────────────────────────────────
 
 def get_current_user(request: Request) -> dict | None:
@@ -44,7 +122,10 @@ def get_current_user(request: Request) -> dict | None:
     if not auth_header.startswith("Bearer "):
         return None
     token = auth_header.replace("Bearer ", "")
-    return auth.verify_firebase_token(token)
+    user = auth.verify_firebase_token(token)
+    if user:
+        log_config.bind(user=user.get("email"))
+    return user
 
 
 def get_google_token(request: Request) -> str | None:
@@ -106,6 +187,10 @@ class ChatRequest(BaseModel):
     message: str
 
 
+class BulkTaskRequest(BaseModel):
+    task_ids: list[str]
+
+
 # ─── Health Check ────────────────────────────────────────────────────────────
 
 @app.get("/")
@@ -118,38 +203,80 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once warm-up has finished, 503 while warming (or if it failed)."""
+    report = warmup.status()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+
+@app.get("/metrics")
+async def metrics_endpoint(request: Request):
+    """Prometheus metrics. Set METRICS_TOKEN to require `Authorization: Bearer <token>`."""
+    metrics_token = os.getenv("METRICS_TOKEN")
+    if metrics_token and request.headers.get("authorization", "") != f"Bearer {metrics_token}":
+        return PlainTextResponse("unauthorized\n", status_code=401)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/traces")
+async def list_traces(request: Request):
+    """Recently stored request traces (requires the X-Debug-Trace token)."""
+    if not tracing.is_authorized(request.headers):
+        return JSONResponse(status_code=403, content={"error": "Forbidden"})
+    return tracing.list_traces()
+
+
+@app.get("/debug/traces/{request_id}")
+async def get_trace(request_id: str, request: Request, format: str = "json"):
+    """
+    A stored trace by request id (the X-Request-Id response header).
+    format=folded returns the CPU profile as folded stacks for flame-graph tools.
+    """
+    if not tracing.is_authorized(request.headers):
+        return JSONResponse(status_code=403, content={"error": "Forbidden"})
+    trace = tracing.get_trace(request_id)
+    if trace is None:
+        return JSONResponse(status_code=404, content={"error": "Trace not found"})
+    if format == "folded":
+        return PlainTextResponse("\n".join(trace.get("profile", [])) + "\n")
+    return trace
+
+
 # ─── Email Routes ────────────────────────────────────────────────────────────
+# Routes that block on Google, Firestore or the LLM are plain `def`: FastAPI runs
+# them in its threadpool, so concurrent requests overlap (and identical upstream
+# reads are coalesced, see single_flight) instead of queueing on the event loop.
 
 @app.get("/emails")
-async def get_emails(request: Request):
+def get_emails(request: Request):
     """Fetch emails from Gmail using the Google access token."""
     user = get_current_user(request)
     if not user:
-        print("⚠️ No authenticated user for /emails")
+        logger.warning("⚠️ No authenticated user for /emails")
         return []
 
     google_token = get_google_token(request)
     if not google_token:
-        print("⚠️ No Google access token in request headers")
+        logger.warning("⚠️ No Google access token in request headers")
         return []
     
-    print(f"✅ Received Google token (len={len(google_token)}) for user {user['email']}")
+    logger.debug(f"✅ Received Google token (len={len(google_token)})")
 
     try:
         credentials = auth.get_gmail_credentials(google_token)
         emails = gmail_service.fetch_emails(credentials, max_results=10)
-        print(f"✅ Fetched {len(emails)} emails for {user['email']}")
-        return emails
+        logger.info(f"✅ Fetched {len(emails)} emails", extra={"upstream": "gmail", "count": len(emails)})
+        return conditional_json(request, emails)
     except Exception as e:
-        print(f"❌ Email fetch error: {e}")
-        traceback.print_exc()
+        logger.exception(f"❌ Email fetch error: {e}", extra={"upstream": "gmail"})
         return []
 
 
 # ─── Task Routes ─────────────────────────────────────────────────────────────
 
 @app.get("/tasks")
-async def get_tasks(request: Request):
+def get_tasks(request: Request):
     """Get all tasks for the current user."""
     user = get_current_user(request)
     if not user:
@@ -157,14 +284,61 @@ async def get_tasks(request: Request):
 
     try:
         tasks = task_manager.get_all_tasks(user["email"])
-        return tasks
+        return conditional_json(request, tasks)
     except Exception as e:
-        print(f"❌ Task fetch error: {e}")
+        logger.error(f"❌ Task fetch error: {e}")
         return []
 
 
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+
+
+@app.get("/tasks/stream")
+async def stream_tasks(request: Request, token: str = None, last_event_id: str = None):
+    """
+    Live task changes as Server-Sent Events (created / updated / deleted / reset).
+    EventSource cannot set headers, so the Firebase token may also be passed as ?token=.
+    Reconnects resume after the Last-Event-ID header (or ?last_event_id=).
+
+    The event bus is per process (see task_events): with several uvicorn workers or
+    instances a stream only carries writes made by the worker serving it. Such
+    deployments must either route each user's requests to one worker or keep
+    polling /tasks alongside the stream; only a single worker can drop polling.
+    """
+    user = get_current_user(request)
+    if not user and token:
+        user = auth.verify_firebase_token(token)
+        if user:
+            log_config.bind(user=user.get("email"))
+    if not user:
+        return JSONResponse(status_code=401, content={"error": "Not authenticated"})
+
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    subscription = task_events.subscribe(user["email"], resume_from)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment frame keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield task_events.format_sse(event)
+        finally:
+            task_events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/create-task")
-async def create_task(req: CreateTaskRequest, request: Request):
+def create_task(req: CreateTaskRequest, request: Request):
     """Create a new task."""
     user = get_current_user(request)
     if not user:
@@ -174,12 +348,12 @@ async def create_task(req: CreateTaskRequest, request: Request):
         task = task_manager.create_task(user["email"], req.model_dump())
         return task
     except Exception as e:
-        print(f"❌ Task creation error: {e}")
+        logger.error(f"❌ Task creation error: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
 @app.get("/calendar/tasks")
-async def get_calendar_tasks(request: Request):
+def get_calendar_tasks(request: Request):
     """Get tasks formatted for the calendar view."""
     user = get_current_user(request)
     if not user:
@@ -188,12 +362,12 @@ async def get_calendar_tasks(request: Request):
     try:
         return task_manager.get_calendar_tasks(user["email"])
     except Exception as e:
-        print(f"❌ Calendar tasks error: {e}")
+        logger.error(f"❌ Calendar tasks error: {e}")
         return []
 
 
 @app.get("/calendar/events")
-async def get_calendar_events(request: Request, year: int = None, month: int = None):
+def get_calendar_events(request: Request, year: int = None, month: int = None):
     """Fetch Google Calendar events for a given month."""
     user = get_current_user(request)
     if not user:
@@ -201,7 +375,7 @@ async def get_calendar_events(request: Request, year: int = None, month: int = N
 
     google_token = get_google_token(request)
     if not google_token:
-        print("⚠️ No Google access token for /calendar/events")
+        logger.warning("⚠️ No Google access token for /calendar/events")
         return []
 
     # Default to current month if not specified
@@ -220,16 +394,15 @@ async def get_calendar_events(request: Request, year: int = None, month: int = N
     try:
         credentials = auth.get_gmail_credentials(google_token)
         events = calendar_service.fetch_events(credentials, time_min=time_min, time_max=time_max)
-        print(f"✅ Fetched {len(events)} calendar events for {user['email']} ({y}-{m})")
-        return events
+        logger.info(f"✅ Fetched {len(events)} calendar events ({y}-{m})", extra={"upstream": "calendar", "count": len(events)})
+        return conditional_json(request, events)
     except Exception as e:
-        print(f"❌ Calendar events error: {e}")
-        traceback.print_exc()
+        logger.exception(f"❌ Calendar events error: {e}", extra={"upstream": "calendar"})
         return []
 
 
 @app.get("/priority-tasks")
-async def get_priority_tasks(request: Request):
+def get_priority_tasks(request: Request):
     """Get all tasks for the priority board."""
     user = get_current_user(request)
     if not user:
@@ -238,12 +411,41 @@ async def get_priority_tasks(request: Request):
     try:
         return task_manager.get_priority_tasks(user["email"])
     except Exception as e:
-        print(f"❌ Priority tasks error: {e}")
+        logger.error(f"❌ Priority tasks error: {e}")
         return {"tasks": []}
 
 
+@app.get("/dashboard")
+def get_dashboard(
+    request: Request,
+    tasks: bool = True,
+    calendar: bool = True,
+    priority: bool = True,
+    stats: bool = True,
+):
+    """
+    Tasks, calendar projection, priority grouping and statistics from one task read.
+    Each section can be switched off, e.g. /dashboard?tasks=false&calendar=false.
+    """
+    user = get_current_user(request)
+    if not user:
+        return {}
+
+    try:
+        return task_manager.get_dashboard(
+            user["email"],
+            include_tasks=tasks,
+            include_calendar=calendar,
+            include_priority=priority,
+            include_stats=stats,
+        )
+    except Exception as e:
+        logger.error(f"❌ Dashboard error: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
 @app.post("/update-task-priority")
-async def update_priority(req: UpdatePriorityRequest, request: Request):
+def update_priority(req: UpdatePriorityRequest, request: Request):
     """Update a task's priority (from drag & drop on priority board)."""
     user = get_current_user(request)
     if not user:
@@ -257,14 +459,14 @@ async def update_priority(req: UpdatePriorityRequest, request: Request):
             return {"status": "updated"}
         return JSONResponse(status_code=404, content={"error": "Task not found"})
     except Exception as e:
-        print(f"❌ Priority update error: {e}")
+        logger.error(f"❌ Priority update error: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
 # ─── Task Lifecycle ──────────────────────────────────────────────────────────
 
 @app.post("/tasks/{task_id}/complete")
-async def complete_task_endpoint(task_id: str, request: Request):
+def complete_task_endpoint(task_id: str, request: Request):
     """Mark a task as completed."""
     user = get_current_user(request)
     if not user:
@@ -277,7 +479,7 @@ async def complete_task_endpoint(task_id: str, request: Request):
 
 
 @app.delete("/tasks/{task_id}")
-async def delete_task_endpoint(task_id: str, request: Request):
+def delete_task_endpoint(task_id: str, request: Request):
     """Delete a single task."""
     user = get_current_user(request)
     if not user:
@@ -289,8 +491,38 @@ async def delete_task_endpoint(task_id: str, request: Request):
     return JSONResponse(status_code=404, content={"error": "Task not found"})
 
 
+@app.post("/tasks/bulk-complete")
+def complete_tasks_bulk_endpoint(req: BulkTaskRequest, request: Request):
+    """Mark many tasks as completed in one batched commit."""
+    user = get_current_user(request)
+    if not user:
+        return {"status": "not_authenticated"}
+
+    try:
+        completed, missing = task_manager.complete_tasks_bulk(user["email"], req.task_ids)
+        return {"status": "completed", "completed": completed, "not_found": missing}
+    except Exception as e:
+        logger.error(f"❌ Bulk complete error: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.post("/tasks/bulk-delete")
+def delete_tasks_bulk_endpoint(req: BulkTaskRequest, request: Request):
+    """Delete many tasks in one batched commit."""
+    user = get_current_user(request)
+    if not user:
+        return {"status": "not_authenticated"}
+
+    try:
+        deleted, missing = task_manager.delete_tasks_bulk(user["email"], req.task_ids)
+        return {"status": "deleted", "deleted": deleted, "not_found": missing}
+    except Exception as e:
+        logger.error(f"❌ Bulk delete error: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
 @app.post("/tasks/clear-all")
-async def clear_all_tasks(request: Request):
+def clear_all_tasks(request: Request):
     """Delete all tasks for current user (reset)."""
     user = get_current_user(request)
     if not user:
@@ -302,11 +534,28 @@ async def clear_all_tasks(request: Request):
 
 # ─── Agent Route ─────────────────────────────────────────────────────────────
 
+async def _timed_stage(timings: dict, name: str, fn, *args, **kwargs):
+    """Run a blocking pipeline stage in a worker thread and record its duration (ms)."""
+    start = time.perf_counter()
+    try:
+        with tracing.span(f"stage.{name}"):
+            return await asyncio.to_thread(fn, *args, **kwargs)
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+# The agent only downloads inbox mail from this window that Gmail search matches
+# against the keyword groups, instead of the newest messages regardless of content
+AGENT_EMAIL_WINDOW_DAYS = int(os.getenv("AGENT_EMAIL_WINDOW_DAYS", "14"))
+AGENT_EMAIL_QUERIES = gmail_service.build_search_queries(ai_engine.SEARCH_KEYWORDS, AGENT_EMAIL_WINDOW_DAYS)
+
+
 @app.post("/agent/run")
 async def run_agent(request: Request):
     """
     AI Agent: Fetches Gmail emails → checks calendar → extracts tasks with AI → saves to Firestore.
     Now uses POST to prevent accidental re-triggers.
+    Gmail, the task read and Calendar run concurrently; only the AI step waits for all three.
     """
     user = get_current_user(request)
     if not user:
@@ -316,94 +565,113 @@ async def run_agent(request: Request):
     if not google_token:
         return {"status": "no_google_token", "tasks_created": 0}
 
+    loader = RequestLoader(user["email"])
+    timings = {}
+    started = time.perf_counter()
+
+    def finish(result: dict) -> dict:
+        timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+        result["timings_ms"] = timings
+        return result
+
     try:
         credentials = auth.get_gmail_credentials(google_token)
 
-        # Step 1: Fetch recent emails
-        emails = gmail_service.fetch_emails(credentials, max_results=10)
+        # Step 1: KEYWORD FILTER runs on each email as Gmail returns it
+        matched_emails = []
+
+        def keep_if_matched(email: dict):
+            matched_emails.extend(ai_engine.filter_emails_by_keywords([email]))
+
+        # Step 2: Calendar window for the local conflict check (see free_busy.py)
+        from datetime import datetime, timedelta
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        time_min = today.isoformat() + "Z"
+        time_max = (today + timedelta(days=free_busy.HORIZON_DAYS)).isoformat() + "Z"
+
+        def fetch_calendar():
+            try:
+                return calendar_service.fetch_events(
+                    credentials, time_min=time_min, time_max=time_max, max_results=250, loader=loader
+                )
+            except Exception:
+                return []  # Calendar might not be enabled
+
+        # Step 3: Independent upstream reads in parallel (the task list is prefetched for dedup)
+        emails, _, calendar_events = await asyncio.gather(
+            _timed_stage(timings, "gmail", gmail_service.fetch_emails,
+                         credentials, max_results=10, loader=loader, on_email=keep_if_matched,
+                         queries=AGENT_EMAIL_QUERIES),
+            _timed_stage(timings, "tasks", task_manager.get_all_tasks, user["email"], loader=loader),
+            _timed_stage(timings, "calendar", fetch_calendar),
+        )
+
         if not emails:
-            return {"status": "no_emails", "tasks_created": 0}
+            return finish({"status": "no_emails", "tasks_created": 0})
 
-        # Step 2: KEYWORD FILTER — only emails matching keywords proceed
-        matched_emails = ai_engine.filter_emails_by_keywords(emails)
         if not matched_emails:
-            return {
+            return finish({
                 "status": "no_matching_emails",
                 "emails_scanned": len(emails),
                 "emails_matched": 0,
                 "tasks_created": 0,
                 "message": "No emails matched your keyword filters",
-            }
-
-        # Step 3: Get existing task titles for dedup
-        existing_titles = list(task_manager.get_existing_titles(user["email"]))
-
-        # Step 4: Get upcoming calendar events for conflict avoidance
-        from datetime import datetime
-        now = datetime.utcnow()
-        time_min = now.isoformat() + "Z"
-        if now.month == 12:
-            time_max = now.replace(year=now.year + 1, month=1, day=1).isoformat() + "Z"
-        else:
-            time_max = now.replace(month=now.month + 1, day=1).isoformat() + "Z"
-
-        calendar_events = []
-        try:
-            calendar_events = calendar_service.fetch_events(credentials, time_min=time_min, time_max=time_max, max_results=10)
-        except Exception:
-            pass  # Calendar might not be enabled
+            })
 
-        # Step 5: AI extracts tasks from ONLY keyword-matched emails
-        extracted_tasks = ai_engine.extract_tasks_from_emails(
-            matched_emails,
-            existing_titles=existing_titles,
-            calendar_events=calendar_events,
+        # Step 4: AI extracts tasks from ONLY keyword-matched emails
+        extracted_tasks = await _timed_stage(
+            timings, "ai", ai_engine.extract_tasks_from_emails, matched_emails,
         )
         if not extracted_tasks:
-            return {
+            return finish({
                 "status": "no_tasks_found",
                 "emails_scanned": len(emails),
                 "emails_matched": len(matched_emails),
                 "tasks_created": 0,
-            }
+            })
 
-        # Step 6: Save tasks to Firestore (bulk with dedup)
-        created_tasks = task_manager.create_tasks_bulk(user["email"], extracted_tasks)
+        # Step 5: Check the tasks against the calendar; the result is saved on each task
+        free_busy.check_tasks(extracted_tasks, free_busy.FreeBusyIndex(calendar_events))
 
-        return {
+        # Step 6: Save tasks to Firestore (bulk with near-duplicate detection, one batched commit)
+        def save():
+            created = task_manager.create_tasks_bulk(user["email"], extracted_tasks, loader=loader)
+            loader.commit()
+            return created
+
+        created_tasks = await _timed_stage(timings, "save", save)
+        schedule = free_busy.schedule_report(created_tasks)
+
+        return finish({
             "status": "success",
             "emails_scanned": len(emails),
             "emails_matched": len(matched_emails),
             "tasks_extracted": len(extracted_tasks),
             "tasks_created": len(created_tasks),
             "tasks": created_tasks,
-        }
+            "schedule": schedule,
+            "conflicts": sum(1 for r in schedule if r["status"] == "conflict"),
+        })
 
     except Exception as e:
-        print(f"❌ Agent error: {e}")
-        traceback.print_exc()
+        logger.exception(f"❌ Agent error: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
 # ─── Chat Route ──────────────────────────────────────────────────────────────
 
 @app.post("/chat")
-async def chat(req: ChatRequest, request: Request):
+def chat(req: ChatRequest, request: Request):
     """AI chat assistant."""
     user = get_current_user(request)
     user_email = user["email"] if user else None
 
-    # Build context from current user's tasks
+    # Context: the user's tasks most relevant to the message, within a token budget
     context = ""
     if user_email:
         try:
-            tasks = task_manager.get_all_tasks(user_email)
-            if tasks:
-                task_summary = "\n".join(
-                    [f"- {t['title']} (priority: {t.get('priority', 'medium')}, date: {t.get('date', 'N/A')})"
-                     for t in tasks[:10]]
-                )
-                context = f"My current tasks:\n{task_summary}"
+            tasks = task_manager.search_tasks(user_email, req.message, limit=10)
+            context = ai_engine.build_task_context(tasks)
         except Exception:
             pass
 
@@ -415,6 +683,9 @@ async def chat(req: ChatRequest, request: Request):
     }
 
 
+warmup.record_app_import((time.perf_counter() - _import_started) * 1000)
+
+
 # ─── Run ─────────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
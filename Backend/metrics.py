@@ -0,0 +1,197 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+Each metric is a dict of label-tuple → value guarded by one lock, so recording a
+sample is a dict lookup, a bisect and an add — cheap enough to leave on in production.
+"""
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from tracing import span
+
+# Seconds; covers a cache hit (ms) up to a slow LLM call (10 s+)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: list = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_label_str(self.label_names, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # [per-bucket counts..., +Inf count], sum, count
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_label_str(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_label_str(self.label_names, key)} {count}")
+        return lines
+
+
+# ─── Metrics ─────────────────────────────────────────────────────────────────
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.")
+REQUESTS_IN_FLIGHT.set(0)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "Latency of calls to Gmail, Calendar, Firestore and Groq.", ("upstream",)
+)
+UPSTREAM_ERRORS = Counter("upstream_errors_total", "Upstream calls that raised.", ("upstream",))
+LLM_TOKENS = Counter("groq_tokens_total", "Groq tokens used, by kind (prompt/completion).", ("kind",))
+TASK_EXTRACTIONS = Counter(
+    "task_extraction_emails_total", "Emails handled by task extraction, by path (rules/llm).", ("path",)
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result"))
+TASK_EVENTS = Counter("task_events_total", "Task change events published, by type.", ("type",))
+SINGLE_FLIGHT_CALLS = Counter(
+    "single_flight_calls_total",
+    "Upstream reads through the single-flight layer, by operation and role (leader ran it, follower shared it).",
+    ("operation", "role"),
+)
+TASK_STREAM_SUBSCRIBERS = Gauge("task_stream_subscribers", "Open /tasks/stream connections.")
+TASK_STREAM_SUBSCRIBERS.set(0)
+
+
+@contextmanager
+def observe_upstream(upstream: str):
+    """
+    Time one upstream call, e.g. `with observe_upstream("gmail.get"): ...`.
+    Also records a trace span when the request is being traced.
+    """
+    start = time.perf_counter()
+    try:
+        with span(upstream):
+            yield
+    except BaseException:
+        UPSTREAM_ERRORS.inc(upstream=upstream)
+        raise
+    finally:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - start, upstream=upstream)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_llm_usage(usage) -> None:
+    """Count prompt/completion tokens from a Groq response.usage object."""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, kind="completion")
+
+
+def record_single_flight(operation: str, shared: bool) -> None:
+    SINGLE_FLIGHT_CALLS.inc(operation=operation, role="follower" if shared else "leader")
+
+
+def _ratios(counter: Counter, name: str, help_text: str, label: str, counted: str) -> list[str]:
+    """Share of `counter` whose second label is `counted`, per value of the first label."""
+    totals: dict[str, list[float]] = {}
+    with counter._lock:
+        items = list(counter._values.items())
+    for (key, result), n in items:
+        counted_and_total = totals.setdefault(key, [0, 0])
+        counted_and_total[1] += n
+        if result == counted:
+            counted_and_total[0] += n
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for key, (part, total) in totals.items():
+        lines.append(f'{name}{{{label}="{_escape(key)}"}} {part / total if total else 0.0}')
+    return lines
+
+
+def render() -> str:
+    """All metrics in Prometheus text format."""
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    lines.extend(_ratios(CACHE_REQUESTS, "cache_hit_ratio", "Hits / lookups since start, by cache.", "cache", "hit"))
+    lines.extend(_ratios(SINGLE_FLIGHT_CALLS, "single_flight_coalesced_ratio",
+                         "Calls that shared an in-flight request / all calls, by operation.", "operation", "follower"))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,60 @@
+"""
+Single-flight coalescing for upstream reads.
+Concurrent identical calls, keyed by (operation, user, arguments…), share one
+in-flight request: the first caller (the leader) runs it and the others wait
+for its result. A dashboard open in two tabs, or /tasks, /calendar/tasks and
+/priority-tasks fired together, then cost one upstream read instead of three.
+
+Followers receive a deep copy, so no caller can mutate another's result; an
+exception raised by the leader is raised in every follower too. Nothing is
+kept once the call finishes — caching is cache.py's job. Coalescing is
+per process; single_flight_calls_total reports it by operation.
+"""
+import copy
+import threading
+from metrics import record_single_flight
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        self.result = None
+        self.error: BaseException | None = None
+
+
+_calls: dict[tuple, _Call] = {}
+_lock = threading.Lock()
+
+
+def do(key: tuple, fn):
+    """Run fn() unless an identical call (same key) is in flight; then share its result."""
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+        else:
+            call.followers += 1
+    record_single_flight(str(key[0]), shared=not leader)
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    try:
+        result = fn()
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            del _calls[key]
+            followers = call.followers
+        if followers and call.error is None:
+            # Snapshot before the leader's caller can touch its result
+            call.result = copy.deepcopy(result)
+        call.done.set()
+    return result
@@ -0,0 +1,179 @@
+"""
+Live task change feed.
+task_manager publishes a delta for every write it makes, and /tasks/stream
+relays a user's deltas to connected clients as Server-Sent Events, so the
+frontend no longer has to poll /tasks, /priority-tasks and /calendar/tasks.
+
+Event ids are "<boot>-<seq>", increasing within a process. The last EVENT_BUFFER
+events per user are kept, so a client reconnecting with Last-Event-ID receives
+exactly what it missed. If that is no longer possible (evicted, server
+restarted, or the client fell too far behind) it receives a "reset" event and
+should refetch /tasks.
+
+A user's channel (buffer and subscriber list) is dropped once nobody is
+subscribed and its newest event is older than EVENT_RETENTION_SECONDS; a
+client resuming into a dropped channel gets a "reset".
+
+Events are in-process: with several workers, each worker streams the writes it
+performed itself (see /tasks/stream in main.py).
+"""
+import os
+import time
+import asyncio
+import itertools
+import threading
+from collections import deque
+from api_responses import dumps
+from metrics import TASK_EVENTS, TASK_STREAM_SUBSCRIBERS
+
+EVENT_BUFFER = int(os.getenv("TASK_EVENT_BUFFER", "256"))
+SUBSCRIBER_QUEUE = int(os.getenv("TASK_STREAM_QUEUE", "1000"))
+EVENT_RETENTION_SECONDS = float(os.getenv("TASK_EVENT_RETENTION_SECONDS", "600"))
+SWEEP_INTERVAL_SECONDS = 60.0
+
+_BOOT = format(int(time.time()), "x")
+_sequence = itertools.count(1)
+_lock = threading.Lock()
+_channels: dict[str, "_Channel"] = {}
+_last_seq = 0
+_last_sweep = time.monotonic()
+
+
+class _Channel:
+    def __init__(self):
+        self.recent = deque(maxlen=EVENT_BUFFER)   # (seq, event)
+        # Newest seq the channel cannot replay: anything published before it existed
+        self.evicted_seq = _last_seq
+        self.subscribers: set["Subscription"] = set()
+        self.touched_at = time.monotonic()
+
+
+def _channel(user_email: str) -> _Channel:
+    # Caller holds _lock
+    channel = _channels.get(user_email)
+    if channel is None:
+        channel = _channels[user_email] = _Channel()
+    return channel
+
+
+def _last_id(channel: _Channel) -> str:
+    return channel.recent[-1][1]["id"] if channel.recent else f"{_BOOT}-{channel.evicted_seq}"
+
+
+def _sweep(now: float) -> None:
+    """Drop channels nobody is subscribed to whose events have aged out. Caller holds _lock."""
+    global _last_sweep
+    if now - _last_sweep < SWEEP_INTERVAL_SECONDS:
+        return
+    _last_sweep = now
+    idle = [user for user, channel in _channels.items()
+            if not channel.subscribers and now - channel.touched_at > EVENT_RETENTION_SECONDS]
+    for user in idle:
+        del _channels[user]
+
+
+class Subscription:
+    """One connected client: an asyncio queue fed from any thread."""
+
+    def __init__(self, user_email: str, backlog: list[dict]):
+        self.user_email = user_email
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE)
+        self.overflowed = False
+        for event in backlog:
+            self.queue.put_nowait(event)
+
+    def _deliver(self, event: dict) -> None:
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self) -> dict:
+        """Next event; a slow client that overflowed its queue gets a single reset instead."""
+        if self.overflowed:
+            self.overflowed = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return _reset_event(self.user_email)
+        return await self.queue.get()
+
+
+def _reset_event(user_email: str) -> dict:
+    # A reset carries the newest id so resuming from it does not trigger another reset
+    with _lock:
+        channel = _channels.get(user_email)
+        last_id = _last_id(channel) if channel else f"{_BOOT}-{_last_seq}"
+    return {"id": last_id, "type": "reset"}
+
+
+def publish(user_email: str, event_type: str, task: dict = None, task_id: str = None, changes: dict = None) -> dict:
+    """
+    Record a task change and push it to the user's open streams.
+    event_type is "created" (with task), "updated" (task_id + changes) or "deleted" (task_id).
+    Safe to call from any thread.
+    """
+    event = {"type": event_type, "task_id": task_id or (task or {}).get("id")}
+    if task is not None:
+        event["task"] = task
+    if changes is not None:
+        event["changes"] = changes
+
+    global _last_seq
+    with _lock:
+        now = time.monotonic()
+        _sweep(now)
+        channel = _channel(user_email)
+        seq = _last_seq = next(_sequence)
+        event["id"] = f"{_BOOT}-{seq}"
+        if len(channel.recent) == channel.recent.maxlen:
+            channel.evicted_seq = channel.recent[0][0]
+        channel.recent.append((seq, event))
+        channel.touched_at = now
+        subscribers = list(channel.subscribers)
+
+    TASK_EVENTS.inc(type=event_type)
+    for sub in subscribers:
+        try:
+            sub.loop.call_soon_threadsafe(sub._deliver, event)
+        except RuntimeError:  # loop already closed
+            pass
+    return event
+
+
+def subscribe(user_email: str, last_event_id: str = None) -> Subscription:
+    """Open a stream for the user, replaying anything after last_event_id."""
+    with _lock:
+        now = time.monotonic()
+        _sweep(now)
+        channel = _channel(user_email)
+        channel.touched_at = now
+        backlog = []
+        if last_event_id:
+            boot, _, seq = last_event_id.partition("-")
+            if boot == _BOOT and seq.isdigit() and int(seq) >= channel.evicted_seq:
+                backlog = [event for s, event in channel.recent if s > int(seq)]
+            else:
+                backlog = [{"id": _last_id(channel), "type": "reset"}]
+        sub = Subscription(user_email, backlog)
+        channel.subscribers.add(sub)
+    TASK_STREAM_SUBSCRIBERS.inc()
+    return sub
+
+
+def unsubscribe(sub: Subscription) -> None:
+    with _lock:
+        channel = _channels.get(sub.user_email)
+        if channel is not None:
+            channel.subscribers.discard(sub)
+            now = time.monotonic()
+            if not channel.subscribers and now - channel.touched_at > EVENT_RETENTION_SECONDS:
+                del _channels[sub.user_email]
+            _sweep(now)
+    TASK_STREAM_SUBSCRIBERS.dec()
+
+
+def format_sse(event: dict) -> str:
+    """Encode an event as an SSE frame (`event:` is the change type)."""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {dumps(event).decode('utf-8')}\n\n"
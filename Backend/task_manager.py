@@ -1,31 +1,103 @@
+import os
 import uuid
-from datetime import datetime
-from firebase_config import get_user_tasks_ref
+from datetime import datetime, date, timedelta
+from dedup import NearDuplicateIndex
+from cache import get_cache, CACHE_BACKEND
+from task_store import get_store
+import task_events
+import task_search
+import single_flight
 
+# Full task lists from a remote store are cached per user and dropped on every write
+# made here. Writes only roll the generation in this process's cache, so with the
+# per-process memory cache another worker (or instance) would keep serving its old
+# list, and 304s for it, until the TTL ran out: task lists are therefore cached by
+# default only with the host-wide SQLite cache. Setting TASKS_CACHE_TTL with the
+# memory backend trades that staleness window for fewer Firestore reads.
+TASKS_CACHE_TTL = int(os.getenv("TASKS_CACHE_TTL", "300" if CACHE_BACKEND == "sqlite" else "0"))
+# Generations outlive the lists they name; they only have to be forgotten eventually
+GENERATION_TTL = 24 * 3600
+# Worker processes serving the app (uvicorn and gunicorn read the same variable)
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+# How long a search index may miss other workers' writes when it cannot see them
+TASK_SEARCH_MAX_AGE = float(os.getenv("TASK_SEARCH_MAX_AGE", "30"))
 
-def get_all_tasks(user_email: str) -> list[dict]:
-    """Get all tasks for a user from Firestore."""
-    tasks_ref = get_user_tasks_ref(user_email)
-    docs = tasks_ref.order_by("date").stream()
 
-    tasks = []
-    for doc in docs:
-        task = doc.to_dict()
-        task["id"] = doc.id
-        tasks.append(task)
-    return tasks
+def _tasks_cache_key(user_email: str) -> tuple:
+    # Writes roll the user's generation instead of deleting the list, so a read that
+    # raced a write can only store its result under a generation nobody asks for
+    cache = get_cache()
+    generation = cache.get(("tasks_generation", user_email))
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.set(("tasks_generation", user_email), generation, GENERATION_TTL)
+    return ("tasks", user_email, generation)
 
 
-def get_existing_titles(user_email: str) -> set[str]:
+def _task_changed(user_email: str, event_type: str, **fields) -> None:
+    """
+    Invalidate the user's cached task list, patch their search index (see
+    task_search) and publish the change (see task_events).
+    """
+    cache = get_cache()
+    old_generation = cache.get(("tasks_generation", user_email))
+    new_generation = uuid.uuid4().hex
+    cache.set(("tasks_generation", user_email), new_generation, GENERATION_TTL)
+    task_search.apply_change(user_email, event_type, old_generation, new_generation, **fields)
+    task_events.publish(user_email, event_type, **fields)
+
+
+def get_all_tasks(user_email: str, limit: int = None, loader=None) -> list[dict]:
+    """
+    Get a user's tasks, ordered by date (optionally only the first `limit`).
+    With a RequestLoader the read happens at most once per request. For a remote
+    store (Firestore) the full list may be cached (TASKS_CACHE_TTL, see above); a
+    limited read is served from it when present, and concurrent identical reads
+    share one query (see single_flight). Local SQLite reads are not worth caching.
+    """
+    if loader is not None:
+        tasks = loader.peek(("tasks", user_email))
+        if tasks is not None:
+            return tasks[:limit] if limit else tasks
+        return loader.load(("tasks", user_email, limit) if limit else ("tasks", user_email),
+                           lambda: get_all_tasks(user_email, limit))
+
+    store = get_store()
+    if not store.remote:
+        return store.list_tasks(user_email, limit)
+
+    key = _tasks_cache_key(user_email)
+
+    def query():
+        # The generation in the key keeps a read started after a write from joining one started before it
+        return single_flight.do((*key, limit), lambda: store.list_tasks(user_email, limit))
+
+    if limit:
+        cached = get_cache().get(key)
+        if cached is not None:
+            return cached[:limit]
+        return query()
+    return get_cache().get_or_compute(key, query, ttl=TASKS_CACHE_TTL)
+
+
+def search_tasks(user_email: str, query: str, limit: int = 10) -> list[dict]:
+    """The user's tasks most relevant to a free-text query (BM25, see task_search)."""
+    generation = _tasks_cache_key(user_email)[2]
+    # The generation sees every write with one worker or a shared cache; otherwise
+    # other workers' writes are only picked up by a periodic rebuild
+    max_age = None if WORKERS <= 1 or CACHE_BACKEND == "sqlite" else TASK_SEARCH_MAX_AGE
+    index = task_search.get_index(user_email, generation, lambda: get_all_tasks(user_email), max_age)
+    return index.search(query, limit)
+
+
+def get_existing_titles(user_email: str, loader=None) -> set[str]:
     """Get all existing task titles for dedup checking."""
-    tasks = get_all_tasks(user_email)
+    tasks = get_all_tasks(user_email, loader=loader)
     return {t.get("title", "").strip().lower() for t in tasks}
 
 
-def create_task(user_email: str, task_data: dict) -> dict:
-    """Create a new task in Firestore."""
-    tasks_ref = get_user_tasks_ref(user_email)
-
+def create_task(user_email: str, task_data: dict, loader=None) -> dict:
+    """Create a new task (deferred to loader.commit() when a loader is given)."""
     task_id = f"task-{uuid.uuid4().hex[:8]}"
     task = {
         "title": task_data.get("title", "Untitled Task"),
@@ -36,68 +108,117 @@ def create_task(user_email: str, task_data: dict) -> dict:
         "status": task_data.get("status", "pending"),
         "createdAt": datetime.now().isoformat(),
     }
+    # Calendar check from /agent/run (see free_busy.check_tasks)
+    if task_data.get("schedule"):
+        task["schedule"] = task_data["schedule"]
+
+    created = {**task, "id": task_id}
+    if loader is None:
+        get_store().create_task(user_email, created)
+        _task_changed(user_email, "created", task=created)
+    else:
+        loader.defer(lambda batch, data=dict(created): batch.create(user_email, data))
+        loader.after_commit(lambda: _task_changed(user_email, "created", task=created))
+        # Keep the memoized task list in step with the pending write
+        memo = loader.peek(("tasks", user_email))
+        if memo is not None:
+            memo.append(dict(created))
 
-    tasks_ref.document(task_id).set(task)
     task["id"] = task_id
     return task
 
 
-def create_tasks_bulk(user_email: str, tasks_list: list[dict]) -> list[dict]:
-    """Create multiple tasks at once, skipping duplicates."""
-    existing = get_existing_titles(user_email)
+def create_tasks_bulk(user_email: str, tasks_list: list[dict], loader=None) -> list[dict]:
+    """Create multiple tasks at once, skipping near-duplicates of existing ones."""
+    index = NearDuplicateIndex(get_all_tasks(user_email, loader=loader))
     created = []
     for task_data in tasks_list:
-        title = task_data.get("title", "").strip().lower()
-        if title and title not in existing:
-            task = create_task(user_email, task_data)
-            created.append(task)
-            existing.add(title)  # Track new ones too
+        if not task_data.get("title", "").strip():
+            continue
+        if index.find_duplicate(task_data):
+            continue
+        task = create_task(user_email, task_data, loader=loader)
+        created.append(task)
+        index.add(task)  # Track new ones too
     return created
 
 
 def complete_task(user_email: str, task_id: str) -> bool:
-    """Mark a task as completed."""
-    tasks_ref = get_user_tasks_ref(user_email)
-    doc_ref = tasks_ref.document(task_id)
-    doc = doc_ref.get()
-    if doc.exists:
-        doc_ref.update({"status": "completed"})
-        return True
-    return False
+    """Mark a task as completed. Returns False if the task does not exist."""
+    if not get_store().update_task(user_email, task_id, {"status": "completed"}):
+        return False
+    _task_changed(user_email, "updated", task_id=task_id, changes={"status": "completed"})
+    return True
 
 
 def delete_task(user_email: str, task_id: str) -> bool:
-    """Delete a single task."""
-    tasks_ref = get_user_tasks_ref(user_email)
-    doc_ref = tasks_ref.document(task_id)
-    doc = doc_ref.get()
-    if doc.exists:
-        doc_ref.delete()
-        return True
-    return False
+    """Delete a single task. Returns False if the task does not exist."""
+    if not get_store().delete_task(user_email, task_id):
+        return False
+    _task_changed(user_email, "deleted", task_id=task_id)
+    return True
+
+
+def complete_tasks_bulk(user_email: str, task_ids: list[str]) -> tuple[list[str], list[str]]:
+    """Mark many tasks as completed. Returns (completed_ids, missing_ids)."""
+    done, missing = get_store().update_tasks(user_email, task_ids, {"status": "completed"})
+    for task_id in done:
+        _task_changed(user_email, "updated", task_id=task_id, changes={"status": "completed"})
+    return done, missing
+
+
+def delete_tasks_bulk(user_email: str, task_ids: list[str]) -> tuple[list[str], list[str]]:
+    """Delete many tasks. Returns (deleted_ids, missing_ids)."""
+    done, missing = get_store().delete_tasks(user_email, task_ids)
+    for task_id in done:
+        _task_changed(user_email, "deleted", task_id=task_id)
+    return done, missing
 
 
 def update_task_priority(user_email: str, title: str, new_priority: str) -> bool:
     """Update a task's priority by matching its title."""
-    tasks_ref = get_user_tasks_ref(user_email)
-    docs = tasks_ref.where("title", "==", title).stream()
+    updated = get_store().update_by_title(user_email, title, {"priority": new_priority})
+    for task_id in updated:
+        _task_changed(user_email, "updated", task_id=task_id, changes={"priority": new_priority})
+    return bool(updated)
 
-    updated = False
-    for doc in docs:
-        doc.reference.update({"priority": new_priority})
-        updated = True
-    return updated
 
-
-def get_priority_tasks(user_email: str) -> dict:
+def get_priority_tasks(user_email: str, loader=None) -> dict:
     """Get all tasks grouped for the priority board."""
-    tasks = get_all_tasks(user_email)
+    tasks = get_all_tasks(user_email, loader=loader)
     return {"tasks": tasks}
 
 
-def get_calendar_tasks(user_email: str) -> list[dict]:
+def get_calendar_tasks(user_email: str, loader=None) -> list[dict]:
     """Get tasks formatted for the calendar view."""
-    tasks = get_all_tasks(user_email)
+    return calendar_projection(get_all_tasks(user_email, loader=loader))
+
+
+def get_dashboard(
+    user_email: str,
+    include_tasks: bool = True,
+    include_calendar: bool = True,
+    include_priority: bool = True,
+    include_stats: bool = True,
+    loader=None,
+) -> dict:
+    """Build every dashboard section from a single task read."""
+    tasks = get_all_tasks(user_email, loader=loader)
+
+    dashboard = {}
+    if include_tasks:
+        dashboard["tasks"] = tasks
+    if include_calendar:
+        dashboard["calendar"] = calendar_projection(tasks)
+    if include_priority:
+        dashboard["priority"] = priority_groups(tasks)
+    if include_stats:
+        dashboard["stats"] = task_statistics(tasks)
+    return dashboard
+
+
+def calendar_projection(tasks: list[dict]) -> list[dict]:
+    """Reshape tasks into calendar items."""
     return [
         {
             "id": t["id"],
@@ -109,12 +230,61 @@ def get_calendar_tasks(user_email: str) -> list[dict]:
     ]
 
 
+def priority_groups(tasks: list[dict]) -> dict:
+    """Group tasks into high / medium / low columns for the priority board."""
+    groups = {"high": [], "medium": [], "low": []}
+    for t in tasks:
+        groups.setdefault(t.get("priority", "medium"), []).append(t)
+    return groups
+
+
+def task_statistics(tasks: list[dict]) -> dict:
+    """Counts by status, priority and due-date bucket."""
+    today = date.today()
+    week_end = today + timedelta(days=7)
+
+    by_status: dict[str, int] = {}
+    by_priority: dict[str, int] = {}
+    by_date = {"overdue": 0, "today": 0, "this_week": 0, "later": 0, "no_date": 0}
+
+    for t in tasks:
+        status = t.get("status", "pending")
+        by_status[status] = by_status.get(status, 0) + 1
+        priority = t.get("priority", "medium")
+        by_priority[priority] = by_priority.get(priority, 0) + 1
+
+        try:
+            due = date.fromisoformat(t.get("date", ""))
+        except (TypeError, ValueError):
+            by_date["no_date"] += 1
+            continue
+        if due < today:
+            # Completed tasks in the past are done, not overdue
+            if status != "completed":
+                by_date["overdue"] += 1
+        elif due == today:
+            by_date["today"] += 1
+        elif due <= week_end:
+            by_date["this_week"] += 1
+        else:
+            by_date["later"] += 1
+
+    total = len(tasks)
+    completed = by_status.get("completed", 0)
+    return {
+        "total": total,
+        "completed": completed,
+        "pending": total - completed,
+        "completion_rate": round(completed / total, 3) if total else 0.0,
+        "by_status": by_status,
+        "by_priority": by_priority,
+        "by_date": by_date,
+    }
+
+
 def delete_all_tasks(user_email: str) -> int:
     """Delete all tasks for a user (reset)."""
-    tasks_ref = get_user_tasks_ref(user_email)
-    docs = tasks_ref.stream()
-    count = 0
-    for doc in docs:
-        doc.reference.delete()
-        count += 1
-    return count
+    deleted = get_store().delete_all(user_email)
+    for task_id in deleted:
+        _task_changed(user_email, "deleted", task_id=task_id)
+    return len(deleted)
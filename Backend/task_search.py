@@ -0,0 +1,204 @@
+"""
+Per-user task search for /chat context.
+Each user's tasks are kept in a small in-memory BM25 index (title, description,
+category, priority and status). task_manager applies its own writes to the
+index as they happen; the index remembers the task-list generation it reflects
+(see task_manager._tasks_cache_key), so a write made by another worker makes
+the next search rebuild it from the store. That generation is only seen by
+other workers when the cache is shared (CACHE_BACKEND=sqlite); with several
+workers and a per-process cache task_manager passes a max_age
+(TASK_SEARCH_MAX_AGE) so an index is not trusted indefinitely.
+"""
+import os
+import math
+import time
+import threading
+from collections import Counter, OrderedDict
+from datetime import date, timedelta
+from dedup import normalize
+
+SEARCH_USERS = int(os.getenv("TASK_SEARCH_USERS", "1000"))
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 2
+
+# Query words that select tasks by due date rather than by text
+_DATE_WORDS = {"today", "tomorrow", "overdue", "week", "upcoming", "next", "due", "soon"}
+
+
+def tokenize(text: str) -> list[str]:
+    """Normalized words with a light plural strip ("assignments" → "assignment")."""
+    return [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+            for w in normalize(text).split()]
+
+
+def _task_terms(task: dict) -> Counter:
+    terms = Counter()
+    for word in tokenize(task.get("title", "")):
+        terms[word] += TITLE_WEIGHT
+    terms.update(tokenize(" ".join(str(task.get(f, "")) for f in ("description", "category", "priority", "status"))))
+    return terms
+
+
+def _due(task: dict) -> date | None:
+    try:
+        return date.fromisoformat(str(task.get("date") or "")[:10])
+    except ValueError:
+        return None
+
+
+class TaskIndex:
+    """BM25 over one user's tasks, updated in place."""
+
+    def __init__(self, tasks: list[dict], generation: str = None):
+        self.generation = generation
+        self.built_at = time.monotonic()
+        self.tasks: dict[str, dict] = {}
+        self._terms: dict[str, Counter] = {}
+        self._lengths: dict[str, int] = {}
+        self._postings: dict[str, dict[str, int]] = {}
+        self._total_length = 0
+        self.lock = threading.Lock()
+        for task in tasks:
+            self.add(task)
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def add(self, task: dict) -> None:
+        task_id = task.get("id")
+        if not task_id:
+            return
+        self.remove(task_id)
+        terms = _task_terms(task)
+        self.tasks[task_id] = dict(task)
+        self._terms[task_id] = terms
+        self._lengths[task_id] = sum(terms.values())
+        self._total_length += self._lengths[task_id]
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[task_id] = tf
+
+    def remove(self, task_id: str) -> None:
+        terms = self._terms.pop(task_id, None)
+        if terms is None:
+            return
+        del self.tasks[task_id]
+        self._total_length -= self._lengths.pop(task_id)
+        for term in terms:
+            posting = self._postings[term]
+            del posting[task_id]
+            if not posting:
+                del self._postings[term]
+
+    def update(self, task_id: str, changes: dict) -> None:
+        task = self.tasks.get(task_id)
+        if task is not None:
+            self.add({**task, **changes})
+
+    def search(self, query: str, limit: int = 10, today: date = None) -> list[dict]:
+        """
+        Tasks ranked by BM25 relevance to the query. Date words ("today",
+        "overdue", "this week"…) boost tasks due then; with no match at all the
+        upcoming pending tasks are returned, soonest first.
+        """
+        with self.lock:
+            return self._rank(tokenize(query), limit, today or date.today())
+
+    def _rank(self, words: list[str], limit: int, today: date) -> list[dict]:
+        scores: dict[str, float] = {}
+
+        n = len(self.tasks)
+        avg_length = self._total_length / n if n else 0
+        for term in set(words):
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for task_id, tf in posting.items():
+                norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * self._lengths[task_id] / avg_length))
+                scores[task_id] = scores.get(task_id, 0.0) + idf * norm
+
+        wanted = _date_window(set(words) & _DATE_WORDS, today)
+        if wanted:
+            start, end = wanted
+            for task_id, task in self.tasks.items():
+                due = _due(task)
+                if due and start <= due <= end and task.get("status") != "completed":
+                    scores[task_id] = scores.get(task_id, 0.0) + 1.0
+
+        if scores:
+            ranked = sorted(scores, key=lambda t: (-scores[t], self.tasks[t].get("date") or ""))
+            return [self.tasks[t] for t in ranked[:limit]]
+
+        upcoming = sorted(
+            (t for t in self.tasks.values() if t.get("status") != "completed"),
+            key=lambda t: (not (_due(t) and _due(t) >= today), t.get("date") or ""),
+        )
+        return upcoming[:limit]
+
+
+def _date_window(words: set[str], today: date) -> tuple[date, date] | None:
+    if "overdue" in words:
+        return date.min, today - timedelta(days=1)
+    if "today" in words:
+        return today, today
+    if "tomorrow" in words:
+        return today + timedelta(days=1), today + timedelta(days=1)
+    if words:
+        return today, today + timedelta(days=7)
+    return None
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PER-USER INDEXES
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_indexes: "OrderedDict[str, TaskIndex]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_index(user_email: str, generation: str, load, max_age: float = None) -> TaskIndex:
+    """
+    The user's index, (re)built with load() unless it already reflects `generation`
+    and, with max_age, was built less than max_age seconds ago.
+    """
+    with _lock:
+        index = _indexes.get(user_email)
+        if index is not None:
+            _indexes.move_to_end(user_email)
+    if (index is not None and index.generation == generation
+            and (max_age is None or time.monotonic() - index.built_at < max_age)):
+        return index
+
+    index = TaskIndex(load(), generation)
+    with _lock:
+        _indexes[user_email] = index
+        _indexes.move_to_end(user_email)
+        while len(_indexes) > SEARCH_USERS:
+            _indexes.popitem(last=False)
+    return index
+
+
+def apply_change(user_email: str, event_type: str, old_generation: str, new_generation: str,
+                 task: dict = None, task_id: str = None, changes: dict = None) -> None:
+    """
+    Apply one of task_manager's writes. Only an index that was current before
+    the write is patched; anything else is dropped and rebuilt on next search.
+    """
+    with _lock:
+        index = _indexes.get(user_email)
+    if index is None:
+        return
+    with index.lock:
+        if index.generation != old_generation:
+            with _lock:
+                if _indexes.get(user_email) is index:
+                    del _indexes[user_email]
+            return
+        if event_type == "created" and task is not None:
+            index.add(task)
+        elif event_type == "updated":
+            index.update(task_id, changes or {})
+        elif event_type == "deleted":
+            index.remove(task_id)
+        index.generation = new_generation
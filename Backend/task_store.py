@@ -0,0 +1,503 @@
+"""
+Task storage behind task_manager.
+
+    TASK_STORE=firestore   users/{email}/tasks in Firestore
+    TASK_STORE=sqlite      local, indexed SQLite database at TASK_DB_PATH
+    TASK_STORE=auto        Firestore when a Firebase key is configured, else SQLite (default)
+
+The SQLite store gives sub-millisecond reads and lets the app run offline or as
+a single node without any Firebase key. With TASK_STORE_SYNC=1 it also
+mirrors every write to Firestore in the background: writes go into an outbox
+table in the same transaction as the task change, and a sync thread drains it
+in batched commits, so nothing is lost across restarts or Firestore outages.
+
+A store hands out tasks as plain dicts with an "id" key, ordered by date.
+"""
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+import firebase_config
+from firebase_config import BATCH_LIMIT, is_not_found
+from dedup import normalize
+from log_config import get_logger
+from metrics import observe_upstream
+
+logger = get_logger("task_store")
+
+TASK_STORE = os.getenv("TASK_STORE", "auto")
+TASK_DB_PATH = os.getenv("TASK_DB_PATH", "tasks.sqlite3")
+TASK_STORE_SYNC = os.getenv("TASK_STORE_SYNC", "0") == "1"
+SYNC_INTERVAL = float(os.getenv("TASK_STORE_SYNC_INTERVAL", "2"))
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FIRESTORE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class _FirestoreBatch:
+    """Creates queued for one batched commit (at most BATCH_LIMIT writes)."""
+
+    def __init__(self):
+        self._batch = firebase_config.get_batch()
+
+    def create(self, user_email: str, task: dict) -> None:
+        data = {k: v for k, v in task.items() if k != "id"}
+        self._batch.set(firebase_config.get_user_tasks_ref(user_email).document(task["id"]), data)
+
+    def commit(self) -> None:
+        with observe_upstream("firestore.commit"):
+            self._batch.commit()
+
+
+class FirestoreTaskStore:
+    # Every read is a network round trip, so task_manager caches full lists
+    remote = True
+
+    def list_tasks(self, user_email: str, limit: int = None) -> list[dict]:
+        query = firebase_config.get_user_tasks_ref(user_email).order_by("date")
+        if limit:
+            query = query.limit(limit)
+        with observe_upstream("firestore.stream"):
+            docs = list(query.stream())
+
+        tasks = []
+        for doc in docs:
+            task = doc.to_dict()
+            task["id"] = doc.id
+            tasks.append(task)
+        return tasks
+
+    def batch(self) -> _FirestoreBatch:
+        return _FirestoreBatch()
+
+    def create_task(self, user_email: str, task: dict) -> None:
+        data = {k: v for k, v in task.items() if k != "id"}
+        with observe_upstream("firestore.set"):
+            firebase_config.get_user_tasks_ref(user_email).document(task["id"]).set(data)
+
+    def update_task(self, user_email: str, task_id: str, fields: dict) -> bool:
+        """Returns False if the task does not exist."""
+        doc_ref = firebase_config.get_user_tasks_ref(user_email).document(task_id)
+        try:
+            # update() carries an exists precondition, so this is one round trip
+            with observe_upstream("firestore.update"):
+                doc_ref.update(fields)
+            return True
+        except Exception as e:
+            if is_not_found(e):
+                return False
+            raise
+
+    def delete_task(self, user_email: str, task_id: str) -> bool:
+        """Returns False if the task does not exist."""
+        doc_ref = firebase_config.get_user_tasks_ref(user_email).document(task_id)
+        try:
+            with observe_upstream("firestore.delete"):
+                doc_ref.delete(option=firebase_config.must_exist())
+            return True
+        except Exception as e:
+            if is_not_found(e):
+                return False
+            raise
+
+    def update_tasks(self, user_email: str, task_ids: list[str], fields: dict) -> tuple[list[str], list[str]]:
+        return self._bulk_write(user_email, task_ids, lambda batch, ref: batch.update(ref, fields))
+
+    def delete_tasks(self, user_email: str, task_ids: list[str]) -> tuple[list[str], list[str]]:
+        return self._bulk_write(
+            user_email, task_ids,
+            lambda batch, ref: batch.delete(ref, option=firebase_config.must_exist()),
+        )
+
+    def _bulk_write(self, user_email: str, task_ids: list[str], write) -> tuple[list[str], list[str]]:
+        """
+        Apply a precondition-guarded write to each task id, one batched commit per chunk.
+        A batch is atomic, so if any id is missing the commit fails as a whole; in that
+        case the missing ids are looked up with one get_all() and the rest is recommitted.
+        """
+        tasks_ref = firebase_config.get_user_tasks_ref(user_email)
+        ids = list(dict.fromkeys(t for t in task_ids if t))
+        done, missing = [], []
+
+        for i in range(0, len(ids), BATCH_LIMIT):
+            chunk = ids[i:i + BATCH_LIMIT]
+            while chunk:
+                batch = firebase_config.get_batch()
+                for task_id in chunk:
+                    write(batch, tasks_ref.document(task_id))
+                try:
+                    with observe_upstream("firestore.commit"):
+                        batch.commit()
+                    done.extend(chunk)
+                    break
+                except Exception as e:
+                    if not is_not_found(e):
+                        raise
+                    with observe_upstream("firestore.get_all"):
+                        snapshots = list(firebase_config.get_all_docs([tasks_ref.document(t) for t in chunk]))
+                    existing = {snap.id for snap in snapshots if snap.exists}
+                    missing.extend(t for t in chunk if t not in existing)
+                    chunk = [t for t in chunk if t in existing]
+
+        return done, missing
+
+    def update_by_title(self, user_email: str, title: str, fields: dict) -> list[str]:
+        """Update every task with exactly this title. Returns the updated ids."""
+        tasks_ref = firebase_config.get_user_tasks_ref(user_email)
+        with observe_upstream("firestore.stream"):
+            docs = list(tasks_ref.where("title", "==", title).stream())
+
+        updated = []
+        for doc in docs:
+            with observe_upstream("firestore.update"):
+                doc.reference.update(fields)
+            updated.append(doc.id)
+        return updated
+
+    def delete_all(self, user_email: str) -> list[str]:
+        """Delete all of a user's tasks. Returns the deleted ids."""
+        tasks_ref = firebase_config.get_user_tasks_ref(user_email)
+        with observe_upstream("firestore.stream"):
+            docs = list(tasks_ref.stream())
+        ids = [doc.id for doc in docs]
+        for i in range(0, len(docs), BATCH_LIMIT):
+            batch = firebase_config.get_batch()
+            for doc in docs[i:i + BATCH_LIMIT]:
+                batch.delete(doc.reference)
+            with observe_upstream("firestore.commit"):
+                batch.commit()
+        return ids
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SQLITE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Task fields stored as columns; anything else lives in the JSON `extra` column
+_COLUMNS = {
+    "title": "title",
+    "description": "description",
+    "date": "date",
+    "priority": "priority",
+    "category": "category",
+    "status": "status",
+    "createdAt": "created_at",
+}
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        user_email TEXT NOT NULL,
+        id TEXT NOT NULL,
+        title TEXT NOT NULL DEFAULT '',
+        title_norm TEXT NOT NULL DEFAULT '',
+        description TEXT,
+        date TEXT,
+        priority TEXT,
+        category TEXT,
+        status TEXT,
+        created_at TEXT,
+        extra TEXT NOT NULL DEFAULT '{}',
+        PRIMARY KEY (user_email, id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS tasks_user_date ON tasks (user_email, date);
+    CREATE INDEX IF NOT EXISTS tasks_user_status ON tasks (user_email, status);
+    CREATE INDEX IF NOT EXISTS tasks_user_priority ON tasks (user_email, priority);
+    CREATE INDEX IF NOT EXISTS tasks_user_title ON tasks (user_email, title_norm);
+    CREATE TABLE IF NOT EXISTS outbox (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_email TEXT NOT NULL,
+        op TEXT NOT NULL,
+        task_id TEXT NOT NULL,
+        payload TEXT
+    );
+"""
+
+_SELECT = "SELECT id, title, description, date, priority, category, status, created_at, extra FROM tasks"
+
+
+def _row_to_task(row) -> dict:
+    task = json.loads(row[8]) if row[8] and row[8] != "{}" else {}
+    # Stored NULLs come back as None, as Firestore returns fields saved as null
+    for (field, _), value in zip(_COLUMNS.items(), row[1:8]):
+        task[field] = value
+    task["id"] = row[0]
+    return task
+
+
+def _split_fields(fields: dict) -> tuple[dict, dict]:
+    columns = {_COLUMNS[k]: v for k, v in fields.items() if k in _COLUMNS}
+    extra = {k: v for k, v in fields.items() if k not in _COLUMNS and k != "id"}
+    if "title" in fields:
+        columns["title_norm"] = normalize(fields["title"] or "")
+    return columns, extra
+
+
+class _SQLiteBatch:
+    def __init__(self, store: "SQLiteTaskStore"):
+        self._store = store
+        self._creates = []
+
+    def create(self, user_email: str, task: dict) -> None:
+        self._creates.append((user_email, task))
+
+    def commit(self) -> None:
+        with self._store._transaction("sqlite.commit") as conn:
+            for user_email, task in self._creates:
+                self._store._insert(conn, user_email, task)
+
+
+class SQLiteTaskStore:
+    """Indexed local store (WAL mode, one connection per thread)."""
+
+    remote = False
+
+    def __init__(self, path: str = TASK_DB_PATH, sync: bool = False):
+        self.path = path
+        self.sync = sync
+        self._local = threading.local()
+        self._syncer = None
+        self._conn().executescript(_SCHEMA)
+        if sync:
+            self._syncer = _FirestoreSync(self)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self, upstream: str):
+        conn = self._conn()
+        with observe_upstream(upstream):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if self._syncer is not None:
+            self._syncer.notify()
+
+    def _outbox(self, conn, user_email: str, op: str, task_id: str, payload: dict = None) -> None:
+        if self.sync:
+            conn.execute(
+                "INSERT INTO outbox (user_email, op, task_id, payload) VALUES (?, ?, ?, ?)",
+                (user_email, op, task_id, json.dumps(payload) if payload is not None else None),
+            )
+
+    def _insert(self, conn, user_email: str, task: dict) -> None:
+        columns, extra = _split_fields(task)
+        columns.setdefault("title_norm", "")
+        names = ["user_email", "id", *columns, "extra"]
+        conn.execute(
+            f"INSERT OR REPLACE INTO tasks ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+            (user_email, task["id"], *columns.values(), json.dumps(extra)),
+        )
+        self._outbox(conn, user_email, "set", task["id"], {k: v for k, v in task.items() if k != "id"})
+
+    # ─── Reads ───
+
+    def list_tasks(self, user_email: str, limit: int = None) -> list[dict]:
+        sql = f"{_SELECT} WHERE user_email = ? ORDER BY date, id"
+        params = (user_email,)
+        if limit:
+            sql += " LIMIT ?"
+            params += (limit,)
+        with observe_upstream("sqlite.query"):
+            rows = self._conn().execute(sql, params).fetchall()
+        return [_row_to_task(row) for row in rows]
+
+    # ─── Writes ───
+
+    def batch(self) -> _SQLiteBatch:
+        return _SQLiteBatch(self)
+
+    def create_task(self, user_email: str, task: dict) -> None:
+        with self._transaction("sqlite.commit") as conn:
+            self._insert(conn, user_email, task)
+
+    def _update(self, conn, user_email: str, task_ids: list[str], fields: dict) -> list[str]:
+        placeholders = ", ".join("?" * len(task_ids))
+        existing = {row[0] for row in conn.execute(
+            f"SELECT id FROM tasks WHERE user_email = ? AND id IN ({placeholders})", (user_email, *task_ids)
+        )}
+        done = [t for t in task_ids if t in existing]
+        if not done:
+            return done
+        columns, extra = _split_fields(fields)
+        assignments = [f"{name} = ?" for name in columns] + ["extra = json_patch(extra, ?)"]
+        conn.execute(
+            f"UPDATE tasks SET {', '.join(assignments)} WHERE user_email = ? AND id IN ({', '.join('?' * len(done))})",
+            (*columns.values(), json.dumps(extra), user_email, *done),
+        )
+        for task_id in done:
+            self._outbox(conn, user_email, "update", task_id, fields)
+        return done
+
+    def _delete(self, conn, user_email: str, task_ids: list[str]) -> list[str]:
+        placeholders = ", ".join("?" * len(task_ids))
+        existing = {row[0] for row in conn.execute(
+            f"SELECT id FROM tasks WHERE user_email = ? AND id IN ({placeholders})", (user_email, *task_ids)
+        )}
+        done = [t for t in task_ids if t in existing]
+        if done:
+            conn.execute(
+                f"DELETE FROM tasks WHERE user_email = ? AND id IN ({', '.join('?' * len(done))})",
+                (user_email, *done),
+            )
+            for task_id in done:
+                self._outbox(conn, user_email, "delete", task_id)
+        return done
+
+    def update_task(self, user_email: str, task_id: str, fields: dict) -> bool:
+        with self._transaction("sqlite.commit") as conn:
+            return bool(self._update(conn, user_email, [task_id], fields))
+
+    def delete_task(self, user_email: str, task_id: str) -> bool:
+        with self._transaction("sqlite.commit") as conn:
+            return bool(self._delete(conn, user_email, [task_id]))
+
+    def update_tasks(self, user_email: str, task_ids: list[str], fields: dict) -> tuple[list[str], list[str]]:
+        ids = list(dict.fromkeys(t for t in task_ids if t))
+        done = []
+        with self._transaction("sqlite.commit") as conn:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for i in range(0, len(ids), BATCH_LIMIT):
+                done += self._update(conn, user_email, ids[i:i + BATCH_LIMIT], fields)
+        done_set = set(done)
+        return done, [t for t in ids if t not in done_set]
+
+    def delete_tasks(self, user_email: str, task_ids: list[str]) -> tuple[list[str], list[str]]:
+        ids = list(dict.fromkeys(t for t in task_ids if t))
+        done = []
+        with self._transaction("sqlite.commit") as conn:
+            for i in range(0, len(ids), BATCH_LIMIT):
+                done += self._delete(conn, user_email, ids[i:i + BATCH_LIMIT])
+        done_set = set(done)
+        return done, [t for t in ids if t not in done_set]
+
+    def update_by_title(self, user_email: str, title: str, fields: dict) -> list[str]:
+        with self._transaction("sqlite.commit") as conn:
+            ids = [row[0] for row in conn.execute(
+                "SELECT id FROM tasks WHERE user_email = ? AND title_norm = ? AND title = ?",
+                (user_email, normalize(title), title),
+            )]
+            return self._update(conn, user_email, ids, fields) if ids else []
+
+    def delete_all(self, user_email: str) -> list[str]:
+        with self._transaction("sqlite.commit") as conn:
+            ids = [row[0] for row in conn.execute("SELECT id FROM tasks WHERE user_email = ?", (user_email,))]
+            conn.execute("DELETE FROM tasks WHERE user_email = ?", (user_email,))
+            for task_id in ids:
+                self._outbox(conn, user_email, "delete", task_id)
+        return ids
+
+    def close(self) -> None:
+        if self._syncer is not None:
+            self._syncer.stop()
+
+
+class _FirestoreSync:
+    """
+    Write-behind mirror: drains the outbox to Firestore in batched commits.
+    Updates are sent as merge-sets and deletes without preconditions, so a
+    batch never fails on a document Firestore has not seen yet.
+    """
+
+    def __init__(self, store: SQLiteTaskStore):
+        self.store = store
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="task-sync", daemon=True)
+        self._thread.start()
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush what is pending (best effort) and stop the thread."""
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        backoff = SYNC_INTERVAL
+        while True:
+            self._wake.wait(backoff)
+            self._wake.clear()
+            try:
+                while self.drain():
+                    pass
+                backoff = SYNC_INTERVAL
+            except Exception as e:
+                logger.warning(f"⚠️ Firestore sync failed, retrying: {e}", extra={"upstream": "firestore"})
+                backoff = min(backoff * 2, 60.0)
+            if self._stopping:
+                return
+
+    def drain(self) -> int:
+        """Push one batch of outbox rows to Firestore. Returns how many were sent."""
+        conn = self.store._conn()
+        rows = conn.execute(
+            "SELECT seq, user_email, op, task_id, payload FROM outbox ORDER BY seq LIMIT ?", (BATCH_LIMIT,)
+        ).fetchall()
+        if not rows:
+            return 0
+
+        batch = firebase_config.get_batch()
+        for _, user_email, op, task_id, payload in rows:
+            ref = firebase_config.get_user_tasks_ref(user_email).document(task_id)
+            if op == "delete":
+                batch.delete(ref)
+            else:
+                batch.set(ref, json.loads(payload), merge=(op == "update"))
+        with observe_upstream("firestore.commit"):
+            batch.commit()
+
+        conn.execute("DELETE FROM outbox WHERE seq <= ?", (rows[-1][0],))
+        return len(rows)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SELECTION
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The configured task store, created on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                kind = TASK_STORE
+                if kind == "auto":
+                    # Decided by configuration, not by whether Firebase came up: a store
+                    # that fell back to a local file on a transient failure would keep
+                    # writes Firestore never sees
+                    kind = "firestore" if firebase_config.is_configured() else "sqlite"
+                    if kind == "firestore" and not firebase_config.init_firebase():
+                        logger.error("❌ Firebase key configured but Firestore is unavailable; "
+                                     "task operations will fail until it initializes")
+                if kind == "sqlite":
+                    _store = SQLiteTaskStore(TASK_DB_PATH, sync=TASK_STORE_SYNC)
+                    logger.info(f"🗄️ Tasks stored in SQLite at {TASK_DB_PATH}"
+                                + (" (write-behind sync to Firestore)" if TASK_STORE_SYNC else ""))
+                else:
+                    _store = FirestoreTaskStore()
+    return _store
+
+
+def close_store() -> None:
+    """Flush pending write-behind sync on shutdown."""
+    if isinstance(_store, SQLiteTaskStore):
+        _store.close()
@@ -0,0 +1,12 @@
+"""
+Test setup: import the backend modules from the parent directory and keep
+logging and start-up work out of the way.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("LOG_FILE", os.devnull)
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("WARMUP", "0")
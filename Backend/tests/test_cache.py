@@ -0,0 +1,65 @@
+import os
+import pickle
+import sqlite3
+import stat
+
+import pytest
+
+from cache import MemoryCache, SQLiteCache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+
+def test_file_is_created_private(path):
+    SQLiteCache(path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_file_readable_by_others_is_refused(path):
+    SQLiteCache(path)
+    os.chmod(path, 0o644)
+    with pytest.raises(PermissionError):
+        SQLiteCache(path)
+
+
+def test_symlinked_file_is_refused(path, tmp_path):
+    target = tmp_path / "elsewhere.sqlite3"
+    target.touch(mode=0o600)
+    os.symlink(target, path)
+    with pytest.raises((PermissionError, OSError)):
+        SQLiteCache(path)
+
+
+def test_values_round_trip_as_json(path):
+    cache = SQLiteCache(path)
+    cache.set(("tasks", "u"), [{"id": "t1", "date": None}], ttl=60)
+    cache.set(("firebase_token", "f"), ({"email": "u@example.com"}, 1.5), ttl=60)
+    assert cache.get(("tasks", "u")) == [{"id": "t1", "date": None}]
+    assert cache.get(("firebase_token", "f")) == [{"email": "u@example.com"}, 1.5]
+
+
+def test_non_json_value_is_not_stored(path):
+    cache = SQLiteCache(path)
+    cache.set("k", object(), ttl=60)
+    assert cache.get("k") is None
+
+
+def test_pickled_row_is_never_unpickled(path):
+    class Boom:
+        def __reduce__(self):
+            return (os.system, ("exit 1",))
+
+    cache = SQLiteCache(path)
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO entries VALUES (?, ?, 1, 1e12, 0)", ("k", pickle.dumps(Boom())))
+    assert cache.get("k") is None
+
+
+def test_get_or_compute_computes_once():
+    cache, calls = MemoryCache(), []
+    for _ in range(3):
+        assert cache.get_or_compute("k", lambda: calls.append(1) or "v", ttl=60) == "v"
+    assert calls == [1]
@@ -0,0 +1,67 @@
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+import api_responses
+from api_responses import CompressionMiddleware
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+
+@app.get("/small")
+def small():
+    return {"ok": True}
+
+
+@app.get("/large")
+def large():
+    return {"items": ["task"] * 500}
+
+
+@app.get("/vary")
+def vary():
+    return PlainTextResponse("x" * 500, headers={"Vary": "Origin"})
+
+
+client = TestClient(app)
+
+
+def test_small_response_still_varies():
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_identity_client_still_varies():
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_large_response_is_compressed():
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == {"items": ["task"] * 500}
+
+
+def test_existing_vary_is_merged():
+    response = client.get("/vary", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+
+
+def test_large_body_is_compressed_off_the_event_loop(monkeypatch):
+    offloaded = []
+    run_sync = api_responses.anyio.to_thread.run_sync
+
+    async def recording_run_sync(fn, *args):
+        offloaded.append(fn)
+        return await run_sync(fn, *args)
+
+    monkeypatch.setattr(api_responses, "COMPRESS_THREAD_MIN_BYTES", 1000)
+    monkeypatch.setattr(api_responses.anyio.to_thread, "run_sync", recording_run_sync)
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == {"items": ["task"] * 500}
+    assert api_responses._compress in offloaded
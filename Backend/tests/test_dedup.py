@@ -0,0 +1,65 @@
+from dedup import NearDuplicateIndex
+
+
+def _dup(existing: dict, new: dict) -> bool:
+    return NearDuplicateIndex([existing]).find_duplicate(new) is not None
+
+
+def test_rephrased_title_is_duplicate():
+    assert _dup({"title": "Submit DBMS assignment"}, {"title": "Submit the DBMS assignment"})
+
+
+def test_different_subject_is_kept():
+    assert not _dup({"title": "Submit DBMS assignment"}, {"title": "Submit OS assignment"})
+
+
+def test_numbered_tasks_are_kept():
+    assert not _dup({"title": "Submit assignment 1"}, {"title": "Submit assignment 2"})
+    assert not _dup({"title": "Pay invoice #1023"}, {"title": "Pay invoice #1024"})
+    assert not _dup({"title": "Submit DBMS assignment"}, {"title": "Submit DBMS assignment 2"})
+
+
+def test_same_number_is_duplicate():
+    assert _dup({"title": "Submit assignment 2"}, {"title": "Submit the assignment 2"})
+
+
+def test_date_must_match_unless_missing():
+    existing = {"title": "Team sync", "date": "2026-10-20"}
+    assert not _dup(existing, {"title": "Team sync", "date": "2026-10-27"})
+    assert _dup(existing, {"title": "Team sync", "date": "2026-10-20"})
+    assert _dup(existing, {"title": "Team sync", "date": ""})
+
+
+def test_description_is_compared_with_a_reworded_title():
+    existing = {"title": "Lab report", "description": "Chemistry titration write-up for Dr. Rao"}
+    assert not _dup(existing, {"title": "Lab report draft", "description": "Physics pendulum experiment analysis"})
+    assert _dup(existing, {"title": "Lab report draft", "description": "Chemistry titration write-up for Dr Rao"})
+
+
+EXISTING = {"title": "Submit DBMS assignment", "description": "Upload the DBMS assignment on the portal",
+            "date": "2026-10-20"}
+
+
+def test_same_title_with_dated_description_is_duplicate():
+    assert _dup(EXISTING, {"title": "Submit DBMS assignment", "description": "Assignment due 2026-10-20 via LMS",
+                           "date": "2026-10-20"})
+
+
+def test_same_title_with_a_time_added_is_duplicate():
+    assert _dup(EXISTING, {"title": "Submit DBMS assignment",
+                           "description": "Upload the DBMS assignment on the portal before 5pm", "date": "2026-10-20"})
+
+
+def test_same_title_without_description_is_duplicate():
+    assert _dup(EXISTING, {"title": "Submit DBMS assignment", "description": "", "date": "2026-10-20"})
+    assert _dup(EXISTING, {"title": "submit the DBMS assignment!", "date": ""})
+
+
+def test_same_title_on_another_day_is_kept():
+    assert not _dup(EXISTING, {"title": "Submit DBMS assignment", "date": "2026-10-27"})
+
+
+def test_added_tasks_are_matched():
+    index = NearDuplicateIndex()
+    index.add({"title": "Book flight tickets"})
+    assert index.find_duplicate({"title": "Book the flight tickets"}) is not None
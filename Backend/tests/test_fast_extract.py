@@ -0,0 +1,47 @@
+from datetime import date
+
+from ai_engine import fast_extract_task, split_fast_path
+
+TODAY = date(2026, 2, 20)
+
+
+def _email(subject: str, snippet: str = "", sender: str = "Asha Rao <asha@college.edu>", body: str = "") -> dict:
+    return {"id": "m1", "subject": subject, "snippet": snippet, "sender": sender, "body": body}
+
+
+def test_clear_cut_deadline_is_extracted():
+    task = fast_extract_task(_email("DBMS assignment submission due 25/03/2026"), TODAY)
+    assert task["date"] == "2026-03-25"
+    assert task["category"] == "Deadline"
+
+
+def test_ambiguous_numeric_date_goes_to_the_model():
+    assert fast_extract_task(_email("Assignment submission due 03/05/2026"), TODAY) is None
+
+
+def test_same_day_and_month_is_not_ambiguous():
+    assert fast_extract_task(_email("Assignment submission due 04/04/2026"), TODAY)["date"] == "2026-04-04"
+
+
+def test_month_name_date_is_extracted():
+    task = fast_extract_task(_email("Interview on 14 March at 10:30 am"), TODAY)
+    assert task["date"] == "2026-03-14"
+    assert task["category"] == "Meeting"
+
+
+def test_promotional_webinar_goes_to_the_model():
+    email = _email("Join our free demo webinar on March 3", sender="Acme <events@acme.io>")
+    assert fast_extract_task(email, TODAY) is None
+    assert fast_extract_task(_email("Join our free demo webinar on March 3"), TODAY) is None
+
+
+def test_bulk_sender_or_unsubscribe_footer_goes_to_the_model():
+    assert fast_extract_task(_email("Meeting on 14 March", sender="news@acme.io"), TODAY) is None
+    assert fast_extract_task(_email("Meeting on 14 March", body="... Unsubscribe here"), TODAY) is None
+
+
+def test_split_keeps_ambiguous_emails_for_the_model():
+    emails = [_email("Exam on 14 March"), _email("Assignment submission due 03/05/2026")]
+    tasks, ambiguous = split_fast_path(emails)
+    assert len(tasks) == 1
+    assert ambiguous == [emails[1]]
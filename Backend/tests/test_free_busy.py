@@ -0,0 +1,45 @@
+from datetime import date
+
+from free_busy import FreeBusyIndex, check_tasks
+
+DAY = date(2026, 11, 3)
+
+
+def _status(events: list[dict]) -> str:
+    return FreeBusyIndex(events).check(DAY)["status"]
+
+
+def test_birthday_on_secondary_calendar_does_not_block():
+    birthday = {"title": "Asha's birthday", "start": "2026-11-03", "end": "2026-11-04", "all_day": True,
+                "is_primary": False, "source_calendar": "Birthdays", "transparency": "transparent"}
+    holiday = {"title": "Holiday", "start": "2026-11-03", "end": "2026-11-04", "all_day": True, "is_primary": False}
+    assert _status([birthday, holiday]) == "free"
+
+
+def test_transparent_timed_event_does_not_block():
+    event = {"title": "Maybe: talk", "start": "2026-11-03T09:00:00+05:30", "end": "2026-11-03T18:00:00+05:30",
+             "is_primary": True, "transparency": "transparent"}
+    assert _status([event]) == "free"
+
+
+def test_all_day_event_on_primary_calendar_blocks():
+    event = {"title": "Offsite", "start": "2026-11-03", "end": "2026-11-04", "all_day": True, "is_primary": True}
+    assert _status([event]) == "conflict"
+
+
+def test_busy_day_keeps_a_free_slot():
+    event = {"title": "Lecture", "start": "2026-11-03T09:00:00+05:30", "end": "2026-11-03T12:00:00+05:30",
+             "is_primary": True}
+    report = FreeBusyIndex([event]).check(DAY)
+    assert report["status"] == "busy"
+    assert report["suggested_slot"] == {"date": "2026-11-03", "start": "12:00", "end": "18:00"}
+
+
+def test_check_tasks_stores_the_result_on_the_task():
+    event = {"title": "Offsite", "start": "2026-11-03", "end": "2026-11-04", "all_day": True, "is_primary": True}
+    tasks = [{"title": "Essay", "date": "2026-11-03"}, {"title": "Someday", "date": ""}]
+    report = check_tasks(tasks, FreeBusyIndex([event]), today=date(2026, 11, 1))
+    assert tasks[0]["schedule"]["status"] == "conflict"
+    assert tasks[0]["schedule"]["suggested_slot"]["date"] == "2026-11-02"
+    assert "schedule" not in tasks[1]
+    assert [r["title"] for r in report] == ["Essay"]
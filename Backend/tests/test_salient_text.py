@@ -0,0 +1,29 @@
+from gmail_service import _salient_lines, salient_text
+
+
+def test_from_in_body_text_is_kept():
+    text = "Hi all,\nFrom: the attached sheet, fill in your marks.\nSubmit it by Friday.\nThanks"
+    assert _salient_lines(text, 500) == "Hi all, From: the attached sheet, fill in your marks. Submit it by Friday. Thanks"
+
+
+def test_outlook_reply_header_is_cut():
+    text = ("Please review by Monday.\n\nFrom: Asha Rao <asha@example.com>\n"
+            "Sent: Friday, 3 October 2026 10:00\nTo: Team\nSubject: Draft\n\nOld thread")
+    assert _salient_lines(text, 500) == "Please review by Monday."
+
+
+def test_from_after_separator_is_cut():
+    text = "See below.\n-----\nFrom: Registrar\nOld thread"
+    assert _salient_lines(text, 500) == "See below."
+
+
+def test_quoted_reply_is_cut():
+    text = "Sounds good.\nOn Mon, 5 Oct 2026, Asha wrote:\n> earlier message"
+    assert _salient_lines(text, 500) == "Sounds good."
+
+
+def test_same_message_id_in_two_mailboxes_is_not_shared():
+    mine = salient_text("msg-1", "Pay the hostel fee by Friday.", "", owner="mailbox-a")
+    theirs = salient_text("msg-1", "Lab viva moved to Monday.", "", owner="mailbox-b")
+    assert mine == "Pay the hostel fee by Friday."
+    assert theirs == "Lab viva moved to Monday."
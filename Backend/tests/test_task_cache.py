@@ -0,0 +1,34 @@
+import importlib
+
+import pytest
+
+import cache
+import task_manager
+
+
+@pytest.fixture
+def reload_task_manager(monkeypatch):
+    def reload(backend: str):
+        monkeypatch.delenv("TASKS_CACHE_TTL", raising=False)
+        monkeypatch.setattr(cache, "CACHE_BACKEND", backend)
+        return importlib.reload(task_manager)
+
+    yield reload
+    monkeypatch.undo()
+    importlib.reload(task_manager)
+
+
+def test_task_lists_are_not_cached_per_process_by_default(reload_task_manager):
+    assert reload_task_manager("memory").TASKS_CACHE_TTL == 0
+
+
+def test_task_lists_are_cached_with_the_shared_backend(reload_task_manager):
+    assert reload_task_manager("sqlite").TASKS_CACHE_TTL == 300
+
+
+def test_generation_is_stable_until_a_write():
+    user = "gen@example.com"
+    first = task_manager._tasks_cache_key(user)
+    assert task_manager._tasks_cache_key(user) == first
+    task_manager._task_changed(user, "deleted", task_id="t1")
+    assert task_manager._tasks_cache_key(user) != first
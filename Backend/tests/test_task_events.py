@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+import task_events
+
+
+@pytest.fixture(autouse=True)
+def fresh_bus(monkeypatch):
+    monkeypatch.setattr(task_events, "_channels", {})
+
+
+def test_resume_replays_missed_events():
+    async def run():
+        first = task_events.publish("a@example.com", "created", task={"id": "t1"})
+        task_events.publish("a@example.com", "deleted", task_id="t1")
+        sub = task_events.subscribe("a@example.com", first["id"])
+        event = await sub.get()
+        task_events.unsubscribe(sub)
+        return event
+
+    assert asyncio.run(run())["type"] == "deleted"
+
+
+def test_idle_channel_is_dropped_after_retention(monkeypatch):
+    async def run():
+        sub = task_events.subscribe("b@example.com")
+        task_events.publish("b@example.com", "created", task={"id": "t1"})
+        monkeypatch.setattr(task_events, "EVENT_RETENTION_SECONDS", 0)
+        task_events.unsubscribe(sub)
+
+    asyncio.run(run())
+    assert "b@example.com" not in task_events._channels
+
+
+def test_channel_with_subscriber_is_kept(monkeypatch):
+    monkeypatch.setattr(task_events, "EVENT_RETENTION_SECONDS", 0)
+    monkeypatch.setattr(task_events, "SWEEP_INTERVAL_SECONDS", 0)
+
+    async def run():
+        sub = task_events.subscribe("c@example.com")
+        task_events.publish("d@example.com", "created", task={"id": "t1"})
+        kept = "c@example.com" in task_events._channels
+        task_events.unsubscribe(sub)
+        return kept
+
+    assert asyncio.run(run())
+
+
+def test_resume_into_dropped_channel_resets_once():
+    async def run():
+        old = task_events.publish("e@example.com", "created", task={"id": "t1"})
+        task_events._channels.clear()
+        task_events.publish("f@example.com", "created", task={"id": "t2"})
+        sub = task_events.subscribe("e@example.com", old["id"])
+        reset = await sub.get()
+        task_events.unsubscribe(sub)
+        again = task_events.subscribe("e@example.com", reset["id"])
+        replayed = again.queue.qsize()
+        task_events.unsubscribe(again)
+        return reset, replayed
+
+    reset, replayed = asyncio.run(run())
+    assert reset["type"] == "reset"
+    assert replayed == 0
@@ -0,0 +1,114 @@
+from datetime import date
+
+import pytest
+
+import task_search
+from ai_engine import build_task_context
+from task_search import TaskIndex
+
+TODAY = date(2026, 10, 19)
+TASKS = [
+    {"id": "t1", "title": "Submit DBMS assignment", "description": "ER diagram", "date": "2026-10-25",
+     "priority": "high", "status": "pending"},
+    {"id": "t2", "title": "Pay hostel fee", "description": "", "date": "2026-10-19", "priority": "medium",
+     "status": "pending"},
+    {"id": "t3", "title": "Read OS chapter 4", "description": "Scheduling assignments", "date": "2026-11-02",
+     "priority": "low", "status": "pending"},
+    {"id": "t4", "title": "Old quiz", "description": "", "date": "2026-10-01", "priority": "low",
+     "status": "completed"},
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_indexes(monkeypatch):
+    monkeypatch.setattr(task_search, "_indexes", task_search.OrderedDict())
+
+
+def _ids(tasks: list[dict]) -> list[str]:
+    return [t["id"] for t in tasks]
+
+
+def test_title_match_ranks_above_description_match():
+    assert _ids(TaskIndex(TASKS).search("assignments", today=TODAY))[:2] == ["t1", "t3"]
+
+
+def test_date_word_selects_tasks_due_then():
+    assert _ids(TaskIndex(TASKS).search("what is due today", today=TODAY)) == ["t2"]
+
+
+def test_no_match_falls_back_to_upcoming_pending_tasks():
+    assert _ids(TaskIndex(TASKS).search("hello", limit=3, today=TODAY)) == ["t2", "t1", "t3"]
+
+
+def test_current_index_is_patched_in_place():
+    loads = []
+    load = lambda: loads.append(1) or TASKS
+    task_search.get_index("u", "g1", load)
+    task_search.apply_change("u", "created", "g1", "g2", task={"id": "t5", "title": "Renew library card"})
+    task_search.apply_change("u", "updated", "g2", "g3", task_id="t2", changes={"title": "Pay mess fee"})
+    task_search.apply_change("u", "deleted", "g3", "g4", task_id="t1")
+
+    index = task_search.get_index("u", "g4", load)
+    assert loads == [1]
+    assert _ids(index.search("library", today=TODAY)) == ["t5"]
+    assert _ids(index.search("mess", today=TODAY)) == ["t2"]
+    assert "t1" not in index.tasks
+
+
+def test_index_from_another_generation_is_rebuilt():
+    loads = []
+    load = lambda: loads.append(1) or TASKS
+    task_search.get_index("u", "g1", load)
+    # A write this process did not see the start of (another worker's)
+    task_search.apply_change("u", "deleted", "g-other", "g2", task_id="t1")
+    index = task_search.get_index("u", "g2", load)
+    assert loads == [1, 1]
+    assert "t1" in index.tasks
+
+
+def test_max_age_forces_a_rebuild():
+    loads = []
+    load = lambda: loads.append(1) or TASKS
+    task_search.get_index("u", "g1", load, max_age=0)
+    task_search.get_index("u", "g1", load, max_age=0)
+    task_search.get_index("u", "g1", load, max_age=60)
+    assert loads == [1, 1]
+
+
+def test_task_context_stops_at_the_budget():
+    context = build_task_context(TASKS, budget=120)
+    assert context.splitlines()[0].startswith("- Submit DBMS assignment (priority: high")
+    assert len(context) <= 120
+    assert "Old quiz" not in context
+
+
+def test_task_without_a_date_is_searchable():
+    index = TaskIndex([{"id": "a", "title": "Pay fee", "date": None},
+                       {"id": "b", "title": "Pay fee", "date": "2026-10-20"}])
+    assert _ids(index.search("fee", today=TODAY)) == ["a", "b"]
+    assert _ids(index.search("hello", today=TODAY)) == ["b", "a"]
+
+
+def _searches_loading(monkeypatch, workers: int, backend: str) -> int:
+    import task_manager
+
+    loads = []
+    monkeypatch.setattr(task_manager, "WORKERS", workers)
+    monkeypatch.setattr(task_manager, "CACHE_BACKEND", backend)
+    monkeypatch.setattr(task_manager, "TASK_SEARCH_MAX_AGE", 0)
+    monkeypatch.setattr(task_manager, "get_all_tasks", lambda user: loads.append(1) or TASKS)
+    for _ in range(3):
+        task_manager.search_tasks("search@example.com", "assignment")
+    return len(loads)
+
+
+def test_single_worker_reuses_the_index(monkeypatch):
+    assert _searches_loading(monkeypatch, workers=1, backend="memory") == 1
+
+
+def test_shared_cache_reuses_the_index(monkeypatch):
+    assert _searches_loading(monkeypatch, workers=4, backend="sqlite") == 1
+
+
+def test_several_workers_with_a_private_cache_rebuild(monkeypatch):
+    assert _searches_loading(monkeypatch, workers=4, backend="memory") == 3
@@ -0,0 +1,124 @@
+import time
+
+import pytest
+
+import firebase_config
+import task_store
+
+
+@pytest.fixture
+def no_store(monkeypatch):
+    monkeypatch.setattr(task_store, "_store", None)
+    monkeypatch.setattr(task_store, "TASK_STORE", "auto")
+    yield
+    task_store._store = None
+
+
+def test_auto_uses_sqlite_without_a_firebase_key(no_store, monkeypatch, tmp_path):
+    monkeypatch.setattr(firebase_config, "is_configured", lambda: False)
+    monkeypatch.setattr(task_store, "TASK_DB_PATH", str(tmp_path / "tasks.sqlite3"))
+    monkeypatch.setattr(task_store, "TASK_STORE_SYNC", False)
+    assert isinstance(task_store.get_store(), task_store.SQLiteTaskStore)
+
+
+def test_auto_keeps_firestore_when_init_fails(no_store, monkeypatch):
+    monkeypatch.setattr(firebase_config, "is_configured", lambda: True)
+    monkeypatch.setattr(firebase_config, "init_firebase", lambda: False)
+    assert isinstance(task_store.get_store(), task_store.FirestoreTaskStore)
+
+
+def test_bulk_update_reports_missing_ids(tmp_path):
+    store = task_store.SQLiteTaskStore(str(tmp_path / "tasks.sqlite3"), sync=False)
+    store.create_task("u@example.com", {"id": "t1", "title": "One", "date": "2026-10-20"})
+    done, missing = store.update_tasks("u@example.com", ["t1", "t2", "t1"], {"status": "completed"})
+    assert done == ["t1"]
+    assert missing == ["t2"]
+    store.close()
+
+
+class _FakeBatch:
+    def __init__(self, log: list, fail: list):
+        self.log, self.fail, self.ops = log, fail, []
+
+    def set(self, ref, data, merge=False):
+        self.ops.append(("merge" if merge else "set", ref, data))
+
+    def delete(self, ref):
+        self.ops.append(("delete", ref, None))
+
+    def commit(self):
+        if self.fail:
+            self.fail.pop()
+            raise RuntimeError("unavailable")
+        self.log.extend(self.ops)
+
+
+class _FakeRef:
+    def __init__(self, user_email):
+        self.user_email = user_email
+
+    def document(self, task_id):
+        return (self.user_email, task_id)
+
+
+@pytest.fixture
+def synced_store(monkeypatch, tmp_path):
+    log, fail = [], []
+    monkeypatch.setattr(task_store, "SYNC_INTERVAL", 0.02)
+    monkeypatch.setattr(firebase_config, "get_batch", lambda: _FakeBatch(log, fail))
+    monkeypatch.setattr(firebase_config, "get_user_tasks_ref", _FakeRef)
+    store = task_store.SQLiteTaskStore(str(tmp_path / "tasks.sqlite3"), sync=True)
+    yield store, log, fail
+    store.close()
+
+
+def _outbox(store) -> list:
+    return store._conn().execute("SELECT op, task_id FROM outbox ORDER BY seq").fetchall()
+
+
+def _wait(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_sync_mirrors_set_update_and_delete_in_order(synced_store):
+    store, log, _ = synced_store
+    store.create_task("u@example.com", {"id": "t1", "title": "One", "date": "2026-10-20"})
+    store.update_task("u@example.com", "t1", {"status": "completed"})
+    store.delete_task("u@example.com", "t1")
+
+    assert _wait(lambda: len(log) == 3)
+    assert [(op, ref) for op, ref, _ in log] == [
+        ("set", ("u@example.com", "t1")),
+        ("merge", ("u@example.com", "t1")),
+        ("delete", ("u@example.com", "t1")),
+    ]
+    assert log[0][2] == {"title": "One", "date": "2026-10-20"}
+    assert log[1][2] == {"status": "completed"}
+    assert _outbox(store) == []
+
+
+def test_failed_commit_keeps_the_outbox_and_retries(synced_store):
+    store, log, fail = synced_store
+    fail.extend([True, True])
+    store.create_task("u@example.com", {"id": "t1", "title": "One"})
+
+    assert _wait(lambda: len(fail) == 1)
+    assert _outbox(store) == [("set", "t1")]
+    assert log == []
+
+    assert _wait(lambda: not _outbox(store))
+    assert [op for op, _, _ in log] == ["set"]
+
+
+def test_sqlite_tasks_keep_null_fields(tmp_path):
+    store = task_store.SQLiteTaskStore(str(tmp_path / "tasks.sqlite3"), sync=False)
+    store.create_task("u@example.com", {"id": "t1", "title": "One", "date": None, "description": None})
+    task = store.list_tasks("u@example.com")[0]
+    assert task["date"] is None
+    assert task["description"] is None
+    store.close()
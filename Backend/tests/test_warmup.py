@@ -0,0 +1,27 @@
+import ai_engine
+import firebase_config
+import warmup
+
+
+def _run(monkeypatch, groq_key):
+    monkeypatch.setattr(warmup, "HEAVY_IMPORTS", [])
+    monkeypatch.setattr(firebase_config, "init_firebase", lambda: False)
+    monkeypatch.setattr(ai_engine, "get_client", lambda: object())
+    if groq_key:
+        monkeypatch.setenv("GROQ_API_KEY", groq_key)
+    else:
+        monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    return warmup.run_warmup()
+
+
+def test_missing_groq_key_is_degraded_but_ready(monkeypatch):
+    report = _run(monkeypatch, None)
+    assert report["state"] == "degraded"
+    assert report["ready"]
+    assert report["components"]["groq_client"]["error"] == "GROQ_API_KEY not set"
+
+
+def test_configured_groq_key_is_ready(monkeypatch):
+    report = _run(monkeypatch, "key")
+    assert report["state"] == "ready"
+    assert report["ready"]
@@ -0,0 +1,174 @@
+"""
+Opt-in per-request tracing and profiling.
+A request is traced when it carries `X-Debug-Trace: <DEBUG_TRACE_TOKEN>` or when
+TRACE_SAMPLE_RATE picks it. Traced requests record nested timing spans for every
+pipeline stage and upstream call; `X-Debug-Profile: 1` additionally runs a
+sampling CPU profiler over the threads doing the request's work. Finished traces
+are kept in a bounded in-memory store keyed by request id.
+
+When a request is not traced, span() is a single ContextVar lookup.
+"""
+import os
+import sys
+import time
+import random
+import threading
+import contextvars
+from collections import OrderedDict, Counter
+from contextlib import contextmanager
+
+DEBUG_TRACE_TOKEN = os.getenv("DEBUG_TRACE_TOKEN", "")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_STORE_SIZE = int(os.getenv("TRACE_STORE_SIZE", "200"))
+PROFILE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_MAX_DEPTH = 64
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("trace_span", default=None)
+_store: "OrderedDict[str, dict]" = OrderedDict()
+_store_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children", "thread", "trace")
+
+    def __init__(self, name: str, trace: "Trace", attrs: dict = None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+        self.thread = threading.get_ident()
+        self.trace = trace
+
+    def to_dict(self, origin: float) -> dict:
+        end = self.end if self.end is not None else time.perf_counter()
+        node = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+        }
+        if self.attrs:
+            node["attrs"] = self.attrs
+        if self.children:
+            node["children"] = [c.to_dict(origin) for c in self.children]
+        return node
+
+
+class Trace:
+    def __init__(self, request_id: str, name: str, profile: bool = False):
+        self.request_id = request_id
+        self.lock = threading.Lock()
+        self.thread_ids = {threading.get_ident()}
+        self.root = Span(name, self)
+        self.profiler = _SamplingProfiler(self) if profile else None
+
+    def to_dict(self) -> dict:
+        data = {"request_id": self.request_id, "root": self.root.to_dict(self.root.start)}
+        if self.profiler:
+            data["profile"] = self.profiler.folded()
+        return data
+
+
+class _SamplingProfiler(threading.Thread):
+    """Samples the stacks of the trace's threads and aggregates them as folded stacks."""
+
+    def __init__(self, trace: Trace):
+        super().__init__(name=f"profiler-{trace.request_id}", daemon=True)
+        self.trace = trace
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(PROFILE_INTERVAL):
+            with self.trace.lock:
+                thread_ids = set(self.trace.thread_ids)
+            frames = sys._current_frames()
+            for tid in thread_ids:
+                frame = frames.get(tid)
+                if frame is not None:
+                    self.samples[_fold(frame)] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join(timeout=1)
+
+    def folded(self) -> list[str]:
+        """`frame;frame;frame count` lines (flamegraph.pl / speedscope compatible)."""
+        return [f"{stack} {n}" for stack, n in self.samples.most_common()]
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None and len(names) < PROFILE_MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def should_trace(headers) -> bool:
+    """Decide whether to trace a request from its headers and the sample rate."""
+    if DEBUG_TRACE_TOKEN and headers.get("x-debug-trace") == DEBUG_TRACE_TOKEN:
+        return True
+    return TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+
+
+def is_authorized(headers) -> bool:
+    return bool(DEBUG_TRACE_TOKEN) and headers.get("x-debug-trace") == DEBUG_TRACE_TOKEN
+
+
+def start_trace(request_id: str, name: str, profile: bool = False) -> tuple[Trace, contextvars.Token]:
+    trace = Trace(request_id, name, profile=profile)
+    token = _current_span.set(trace.root)
+    if trace.profiler:
+        trace.profiler.start()
+    return trace, token
+
+
+def finish_trace(trace: Trace, token: contextvars.Token, **attrs) -> None:
+    """Close the root span and keep the trace for later retrieval."""
+    trace.root.end = time.perf_counter()
+    trace.root.attrs.update(attrs)
+    if trace.profiler:
+        trace.profiler.stop()
+    _current_span.reset(token)
+    with _store_lock:
+        _store[trace.request_id] = trace.to_dict()
+        while len(_store) > TRACE_STORE_SIZE:
+            _store.popitem(last=False)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Record a nested timing span if the current request is being traced."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    trace = parent.trace
+    child = Span(name, trace, attrs)
+    with trace.lock:
+        parent.children.append(child)
+        trace.thread_ids.add(child.thread)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def get_trace(request_id: str) -> dict | None:
+    with _store_lock:
+        return _store.get(request_id)
+
+
+def list_traces() -> list[dict]:
+    """Most recent traces first: request id, root name and duration."""
+    with _store_lock:
+        traces = list(_store.values())
+    return [
+        {"request_id": t["request_id"], "name": t["root"]["name"], "duration_ms": t["root"]["duration_ms"]}
+        for t in reversed(traces)
+    ]
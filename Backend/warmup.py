@@ -0,0 +1,127 @@
+"""
+Background warm-up and import-time report.
+Heavy SDKs (firebase_admin, Firestore, googleapiclient, groq, google-auth) are no
+longer imported when the app starts. On startup a daemon thread imports them and
+creates the shared clients, timing each step, so the first real request usually
+finds everything warm while the process still answers health checks immediately.
+/ready reports the progress; `python warmup.py` prints the breakdown.
+"""
+import os
+import time
+import threading
+import importlib
+
+# Imported in this order; a shared dependency is charged to the first module that pulls it in
+HEAVY_IMPORTS = [
+    "google.oauth2.credentials",
+    "google.api_core.exceptions",
+    "firebase_admin",
+    "firebase_admin.auth",
+    "google.cloud.firestore",
+    "googleapiclient.discovery",
+    "google_auth_httplib2",
+    "groq",
+]
+
+_lock = threading.Lock()
+_thread: threading.Thread | None = None
+_state = {
+    "state": "pending",   # pending → warming → ready | degraded | failed, or disabled
+    "started_at": None,
+    "duration_ms": None,
+    "app_import_ms": None,
+    "imports_ms": {},
+    "components": {},
+}
+
+
+def record_app_import(ms: float) -> None:
+    with _lock:
+        _state["app_import_ms"] = round(ms, 1)
+
+
+def _step(section: str, name: str, fn) -> bool:
+    start = time.perf_counter()
+    ok, error = True, None
+    try:
+        result = fn()
+        if result is False:
+            ok, error = False, "unavailable"
+    except Exception as e:
+        ok, error = False, str(e)
+    entry = {"ms": round((time.perf_counter() - start) * 1000, 1), "ok": ok}
+    if error:
+        entry["error"] = error
+    with _lock:
+        _state[section][name] = entry
+    return ok
+
+
+def run_warmup() -> dict:
+    """Import heavy dependencies and create clients, timing each step. Returns status()."""
+    import ai_engine
+    import firebase_config
+
+    with _lock:
+        _state["state"] = "warming"
+        _state["started_at"] = time.time()
+    start = time.perf_counter()
+
+    for module in HEAVY_IMPORTS:
+        _step("imports_ms", module, lambda m=module: importlib.import_module(m))
+
+    # A missing Firebase key is a configuration state, not a warm-up failure
+    _step("components", "firestore", firebase_config.init_firebase)
+    # Likewise a missing Groq key: /chat and extraction degrade, every other route works
+    groq_configured = bool(os.getenv("GROQ_API_KEY"))
+    if groq_configured:
+        groq_ok = _step("components", "groq_client", ai_engine.get_client)
+    else:
+        groq_ok = False
+        with _lock:
+            _state["components"]["groq_client"] = {"ms": 0.0, "ok": False, "error": "GROQ_API_KEY not set"}
+
+    with _lock:
+        _state["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        imports_ok = all(entry["ok"] for entry in _state["imports_ms"].values())
+        if not imports_ok or (groq_configured and not groq_ok):
+            _state["state"] = "failed"
+        else:
+            _state["state"] = "ready" if groq_ok else "degraded"
+    return status()
+
+
+def start_background_warmup() -> threading.Thread:
+    """Run run_warmup() once on a daemon thread."""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+            _thread.start()
+        return _thread
+
+
+def mark_disabled() -> None:
+    with _lock:
+        _state["state"] = "disabled"
+
+
+def status() -> dict:
+    """Warm-up state plus per-import and per-component timings."""
+    with _lock:
+        report = {
+            **_state,
+            "imports_ms": dict(_state["imports_ms"]),
+            "components": dict(_state["components"]),
+        }
+    # Disabled means everything is initialized lazily on first use; degraded means the
+    # LLM is not configured. Both are still servable
+    report["ready"] = report["state"] in ("ready", "degraded", "disabled")
+    return report
+
+
+if __name__ == "__main__":
+    import json
+    import main  # noqa: F401  (records app_import_ms)
+
+    print(json.dumps(run_warmup(), indent=2))